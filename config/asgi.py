@@ -3,6 +3,30 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with uvicorn so the async views (contact, submit_review and
+tours' tour_book) wait on the database without holding a worker thread.
+This is the Procfile's web process:
+
+    uvicorn config.asgi:application --host 0.0.0.0 --port $PORT --workers 4
+
+The middleware stack is fully async-capable (see main/middleware.py), so
+requests are not adapted back to sync on the way in. Sync views keep
+working; Django runs them in a thread.
+
+To compare concurrent-POST throughput against gunicorn/WSGI, start both
+servers on the same database and point the benchmark at them. The servers
+must trust the benchmark's X-Forwarded-For (one address per request), or
+every request shares 127.0.0.1's throttle bucket and the run turns into
+429s, and the in-flight cap must be above --concurrency, or it sheds the
+excess as 503s:
+
+    export THROTTLE_PROXY_COUNT=1 THROTTLE_MAX_IN_FLIGHT=64 PAGE_CACHE_TIMEOUT=0
+    gunicorn config.wsgi:application -b 127.0.0.1:8001 -w 4
+    uvicorn config.asgi:application --port 8002 --workers 4
+    python manage.py benchmark --mode http --no-budgets --concurrency 64 \
+        --only contact submit_review \
+        --base-url http://127.0.0.1:8001 http://127.0.0.1:8002
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,73 @@
+"""
+Primary/replica database routing.
+
+When settings.DATABASES defines a "replica" alias, reads for the main and
+tours apps go to it and all writes go to "default". A client that has just
+written is pinned to the primary for REPLICA_PIN_SECONDS so it reads its own
+writes despite replication lag. The pin lives in a contextvar for the
+current request and in a cookie for the ones after it
+(see main.middleware.ReplicaPinningMiddleware).
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+# Mutable per-request state: {"pinned": bool, "wrote": bool}, or None outside a request.
+_request_state = ContextVar("db_routing_state", default=None)
+
+
+def begin_request(pinned=False):
+    """Start tracking a request; returns a token for end_request()."""
+    return _request_state.set({"pinned": pinned, "wrote": False})
+
+
+def end_request(token):
+    """Stop tracking and report whether the request wrote to the primary."""
+    state = _request_state.get()
+    _request_state.reset(token)
+    return bool(state and state["wrote"])
+
+
+def pin_to_primary():
+    """Send every further read in this request to the primary."""
+    state = _request_state.get()
+    if state is not None:
+        state["pinned"] = True
+        state["wrote"] = True
+
+
+class PrimaryReplicaRouter:
+    route_app_labels = {"main", "tours"}
+
+    def _routed(self, model):
+        return model._meta.app_label in self.route_app_labels
+
+    def db_for_read(self, model, **hints):
+        if not self._routed(model) or REPLICA not in settings.DATABASES:
+            return None
+        state = _request_state.get()
+        if (state and state["pinned"]) or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        if not self._routed(model):
+            return None
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication.
+        if db == REPLICA:
+            return False
+        return None
@@ -38,8 +38,10 @@ DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
 # MIDDLEWARE
 MIDDLEWARE = [
+    "main.middleware.PerformanceMiddleware",  # outermost, so it times everything below
+    "main.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # must be just after SecurityMiddleware
+    "main.middleware.AsyncWhiteNoiseMiddleware",  # WhiteNoise; must be just after SecurityMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -76,14 +78,69 @@ if os.getenv("DATABASE_URL"):
         "default": dj_database_url.config(conn_max_age=600, ssl_require=True)
     }
 else:
-    # Use SQLite locally
+    # Use SQLite locally (write retries and opt-in WAL mode, see config/sqlite_backend)
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
+            "ENGINE": "config.sqlite_backend",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+            },
         }
     }
 
+SQLITE_PRAGMAS = {
+    "busy_timeout": 5000,        # ms to wait for the write lock
+    "mmap_size": 268435456,      # 256 MB memory-mapped reads
+    "cache_size": -20000,        # ~20 MB page cache per connection
+    "temp_store": "MEMORY",
+}
+# WAL is stored in the database file itself (and leaves -wal/-shm files next
+# to it), so it is a per-deployment opt-in rather than something every
+# checkout, test run or manage.py call writes into db.sqlite3.
+SQLITE_WAL = os.environ.get("SQLITE_WAL", "False") == "True"
+if SQLITE_WAL:
+    SQLITE_PRAGMAS.update({
+        "journal_mode": "WAL",   # readers no longer block behind the writer
+        "synchronous": "NORMAL", # safe with WAL, far fewer fsyncs
+    })
+SQLITE_WRITE_RETRIES = 5      # extra BEGIN IMMEDIATE attempts after busy_timeout expires
+SQLITE_RETRY_BACKOFF = 0.05   # seconds, doubled per attempt (capped at 1s), with jitter
+
+# CACHE
+# Cached pages and fragments are invalidated by bumping a version key, so the
+# cache must be shared by every worker and by management commands (imports,
+# seeding, renditions), or their bumps never reach the web processes. Use
+# Redis in production; without it, a file cache shared by the processes on
+# this host.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_DIR", BASE_DIR / ".cache"),
+        }
+    }
+
+TOUR_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24  # seconds; entries are also versioned
+PAGE_CACHE_TIMEOUT = int(os.environ.get("PAGE_CACHE_TIMEOUT", 60 * 10))  # seconds for whole public pages; 0 disables
+TOUR_FEED_CHUNK_SIZE = 500  # tours per query (and gallery prefetch) in the partner feed
+
+# Optional read replica, e.g. DATABASE_REPLICA_URL=sqlite:////abs/path/replica.sqlite3
+# (a copy of db.sqlite3) to try the routing locally with two SQLite files.
+if os.getenv("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = dj_database_url.parse(os.getenv("DATABASE_REPLICA_URL"), conn_max_age=600)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["config.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 10  # after a write, the client reads from the primary this long
+
 # PASSWORD VALIDATION
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -108,6 +165,25 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# RESPONSIVE IMAGES (see main/images.py)
+IMAGE_RENDITION_WIDTHS = (160, 320, 640, 1024, 1600)  # 160 is for admin thumbnails
+IMAGE_RENDITION_FORMATS = ("webp",)  # add "avif" to also emit AVIF when Pillow supports it
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITIONS_ON_UPLOAD = True  # set False to leave it to `manage.py generate_renditions`
+
+# SESSIONS
+# Lean anonymous mode keeps sessions and flash messages in signed cookies, so
+# returning visitors' page views never touch the database. The trade-offs apply
+# to every session, staff and admin logins included: session data is limited
+# to ~4KB, readable (not writable) by the client, and a login can only be
+# revoked by rotating SECRET_KEY. Off by default; set LEAN_ANONYMOUS=True only
+# for deployments without staff logins. DB sessions still load lazily, so a
+# first visit without a session cookie runs no session query either way.
+LEAN_ANONYMOUS = os.environ.get("LEAN_ANONYMOUS", "False") == "True"
+if LEAN_ANONYMOUS:
+    SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+    MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
 # MESSAGES FRAMEWORK
 MESSAGE_TAGS = {
     messages.DEBUG: "debug",
@@ -129,8 +205,72 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# EMAIL OUTBOX (drained by `manage.py send_queued_mail --loop`)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60  # doubled after every failed attempt
+
 # DEFAULT PRIMARY KEY FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# REVIEWS
+REVIEWS_PAGE_SIZE = 10  # reviews returned per "More Reviews" request
+REVIEW_STREAM_MAX_CLIENTS = 500  # open live-review streams per ASGI process
+REVIEW_STREAM_QUEUE_SIZE = 100  # undelivered events per stream before it is told to resync
+REVIEW_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+REVIEW_MODERATION_MAX_IDS = 1000  # explicit ids per bulk moderation request; larger sweeps use a filter
+
+# BOOKINGS (tours app)
+BOOKING_HOLD_MINUTES = 30  # unconfirmed seat holds are released after this
+AVAILABILITY_SEARCH_LIMIT = 200  # max departures returned by the availability search
+
+# THROTTLING (main.throttle) for anonymous POSTs: "n/period" = bursts of n, then one per period/n
+THROTTLE_RATES = {
+    "review": "5/min",  # home page form and AJAX submit_review
+    "contact": "3/min",
+    "booking": "5/min",
+}
+THROTTLE_MAX_IN_FLIGHT = int(os.environ.get("THROTTLE_MAX_IN_FLIGHT", 20))  # throttled POSTs handled at once per process; more get a 503
+# Trusted proxies in front of the app that append to X-Forwarded-For. With
+# 0 the client is REMOTE_ADDR, the only safe choice when clients connect
+# directly (otherwise they pick their own bucket by forging the header).
+# Render's router adds exactly one hop and Render sets RENDER on every
+# service, so deploys there default to 1; set THROTTLE_PROXY_COUNT for
+# other proxies.
+THROTTLE_PROXY_COUNT = int(os.environ.get("THROTTLE_PROXY_COUNT", "1" if os.environ.get("RENDER") else "0"))
+
+# TOUR SEARCH
+TOUR_SEARCH_LIMIT = 100  # max ranked hits returned for ?q= on /tours/
+
+# ADMIN
+# Unfiltered changelists of tables at least this big show the planner's row
+# estimate instead of running COUNT(*) (main.pagination.EstimatedCountPaginator).
+ADMIN_ESTIMATED_COUNT_MIN = 100_000
+ADMIN_REVIEW_SEARCH_LIMIT = 1000  # review admin search shows the newest N matches
+
+# PERFORMANCE INSTRUMENTATION (main.middleware.PerformanceMiddleware)
+PERF_SERVER_TIMING = True  # add a Server-Timing header to every response
+PERF_SLOW_REQUEST_MS = 500  # threshold for the slow-request SQL log
+PERF_SLOW_SQL_SAMPLE_RATE = float(os.environ.get("PERF_SLOW_SQL_SAMPLE_RATE", "0"))  # 0 disables capture
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "main.performance": {
+            "handlers": ["console"],
+            "level": os.environ.get("PERF_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # BRANDING
-SITE_NAME = "MB Travels"
\ No newline at end of file
+SITE_NAME = "MB Travels"
+SITE_URL = os.environ.get("SITE_URL", "https://mbtravels.com")  # absolute links built outside a request
+
+# SITEMAP (main.sitemap)
+SITEMAP_SHARD_SIZE = 10_000  # tour ids per sitemap file; the protocol allows up to 50,000 URLs
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+SQLite backend tuned for concurrent web workers.
+
+Selected with ENGINE "config.sqlite_backend". On every new connection it
+applies settings.SQLITE_PRAGMAS (busy_timeout, mmap and page cache, plus
+the WAL journal and synchronous=NORMAL when SQLITE_WAL is set). Transactions opened by atomic()
+use BEGIN IMMEDIATE (OPTIONS["transaction_mode"]) so the write lock is taken
+up front instead of failing on lock upgrade halfway through. If the lock is
+still busy after busy_timeout, BEGIN is retried with bounded, jittered
+backoff before the error is raised.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        delay = settings.SQLITE_RETRY_BACKOFF
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                return super()._start_transaction_under_autocommit()
+            except OperationalError as exc:
+                if not is_lock_error(exc) or attempt == settings.SQLITE_WRITE_RETRIES:
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 1.0)
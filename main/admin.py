@@ -1,14 +1,76 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Review, Tour, TourImage
+from .models import Review, Tour, TourImage, OutboundEmail
+from .cache import bump_catalogue_version
+from .facets import location_options
+from .images import thumbnail_url
+from .moderation import DELETE, HIDE, RESTORE, moderate
+from .pagination import EstimatedCountPaginator
+from .search import search_reviews
 
 
 # --- Review Admin ---
+# Built to stay fast with millions of rows: no exact COUNT(*) of the whole
+# table, and search goes through the full-text index instead of LIKE '%…%'.
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('id', 'display_name', 'content', 'created_at')
-    search_fields = ('id', 'name', 'content')
-    ordering = ('-created_at',)
+    list_display = ('id', 'display_name', 'tour', 'rating', 'content', 'is_hidden', 'created_at')
+    list_filter = ('rating', 'is_hidden')
+    list_select_related = ('tour',)
+    search_fields = ('content',)  # shows the search box; see get_search_results
+    search_help_text = (
+        "A review id, or words from the reviewer's name or the review (prefix matching; "
+        "shows the newest matches only)."
+    )
+    ordering = ('-created_at', '-id')  # walks review_feed_idx
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return search_reviews(term, queryset), False
+
+    # --- Bulk moderation (main/moderation.py): one statement, however many rows ---
+    actions = ["hide_reviews", "restore_reviews"]
+
+    def hide_reviews(self, request, queryset):
+        updated = moderate(queryset, HIDE)
+        self.message_user(request, f"{updated} review(s) hidden from the site")
+    hide_reviews.short_description = "Hide selected reviews"
+
+    def restore_reviews(self, request, queryset):
+        updated = moderate(queryset, RESTORE)
+        self.message_user(request, f"{updated} review(s) shown on the site again")
+    restore_reviews.short_description = "Show selected reviews again"
+
+    def delete_queryset(self, request, queryset):
+        # Used by the built-in "Delete selected" action after its confirmation page
+        moderate(queryset, DELETE)
+
+
+def _thumbnail(obj, empty_html):
+    """Small rendition for list and inline previews; never the full-size original."""
+    if not obj.image:
+        return format_html(empty_html)
+    url = thumbnail_url(obj)
+    if not url:
+        return format_html('<span style="color: #999;">Preview pending</span>')
+    return format_html(
+        '<img src="{}" loading="lazy" style="width: 100px; height: auto; border-radius:4px;" />', url
+    )
+
+
+def _set_featured(queryset, value):
+    # update() skips auto_now and post_save: stamp modified_at for the cached
+    # cards, feed and sitemap, and bump the catalogue version by hand.
+    updated = queryset.update(is_featured=value, modified_at=timezone.now())
+    bump_catalogue_version()
+    return updated
 
 
 # --- Inline for Tour Images ---
@@ -18,20 +80,32 @@ class TourImageInline(admin.TabularInline):  # use StackedInline if you prefer l
     readonly_fields = ('image_preview',)
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" style="width: 100px; height: auto; border-radius:4px;" />', obj.image.url)
-        return format_html('<span style="color: #999;">No Image</span>')
+        return _thumbnail(obj, '<span style="color: #999;">No Image</span>')
     image_preview.short_description = "Preview"
 
 
 # --- Tour Admin ---
+class LocationFilter(admin.SimpleListFilter):
+    """Like list_filter 'location', minus the SELECT DISTINCT on every page load."""
+    title = "location"
+    parameter_name = "location"
+
+    def lookups(self, request, model_admin):
+        return [(location, location) for location in location_options()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(location=self.value())
+        return queryset
+
+
 @admin.register(Tour)
 class TourAdmin(admin.ModelAdmin):
     list_display = ('name', 'location', 'duration', 'price', 'is_featured', 'image_preview')
     list_display_links = ('name',)
     list_editable = ('is_featured',)
     search_fields = ('name', 'location')
-    list_filter = ('is_featured', 'location')
+    list_filter = ('is_featured', LocationFilter)
     readonly_fields = ('image_preview',)
     inlines = [TourImageInline]
     ordering = ('-id',)
@@ -40,21 +114,40 @@ class TourAdmin(admin.ModelAdmin):
     actions = ["mark_as_featured", "mark_as_unfeatured"]
 
     def mark_as_featured(self, request, queryset):
-        updated = queryset.update(is_featured=True)
+        updated = _set_featured(queryset, True)
         self.message_user(request, f"{updated} tour(s) successfully marked as Featured ✅")
     mark_as_featured.short_description = "Mark selected tours as Featured"
 
     def mark_as_unfeatured(self, request, queryset):
-        updated = queryset.update(is_featured=False)
+        updated = _set_featured(queryset, False)
         self.message_user(request, f"{updated} tour(s) successfully unmarked as Featured ❌")
     mark_as_unfeatured.short_description = "Unmark selected tours as Featured"
 
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" style="width: 100px; height: auto; border-radius:4px;" />', obj.image.url)
-        return format_html('<img src="/static/images/placeholder-tour.jpg" style="width: 100px; height: auto; border-radius:4px;" />')
+        return _thumbnail(
+            obj, '<img src="/static/images/placeholder-tour.jpg" style="width: 100px; height: auto; border-radius:4px;" />'
+        )
     image_preview.short_description = "Main Preview"
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related()
+
+
+# --- Outbound Email Admin ---
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    ordering = ('-created_at',)
+
+    actions = ["retry_now"]
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=OutboundEmail.STATUS_SENT).update(
+            status=OutboundEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} email(s) queued for another attempt")
+    retry_now.short_description = "Retry selected emails now"
@@ -0,0 +1,240 @@
+"""
+Latency benchmark for the public views.
+
+Scenarios can be driven in-process through django.test.Client, which also
+records exact query counts, or over real HTTP against a running server with
+a thread pool. In HTTP mode query counts are read back from the
+Server-Timing header added by PerformanceMiddleware, and several servers
+can be measured in one run to compare them (e.g. gunicorn vs uvicorn).
+Either way BEGIN/COMMIT and savepoints are not counted, so the budgets
+hold the same under the test runner's wrapping transaction as on a real
+database.
+
+The POST scenarios are throttled (main/throttle.py). Every request comes
+from its own client address (REMOTE_ADDR in-process; X-Forwarded-For over
+HTTP, which the server only trusts when started with THROTTLE_PROXY_COUNT=1).
+In-process runs also lift THROTTLE_RATES, and HTTP runs drop the session
+cookie, so they time the views, not 429 rejections.
+
+GET scenarios time the views, not the whole-page cache (main/cache.py):
+in-process runs turn it off, and servers measured over HTTP should be
+started with PAGE_CACHE_TIMEOUT=0.
+Any response other than the scenario's expected status fails the run.
+"""
+import itertools
+import json
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .middleware import is_transaction_control
+from .models import Review, Tour
+from .pagination import keyset_page
+
+Scenario = namedtuple("Scenario", "name method path data ajax expect", defaults=(None, False, 200))
+
+_QUERY_COUNT = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def default_scenarios():
+    """The pages whose latency we budget for, built from the current data."""
+    scenarios = [
+        Scenario("home", "GET", reverse("home")),
+        Scenario("tours", "GET", reverse("tours")),
+        Scenario("tours_search", "GET", reverse("tours") + "?q=safari"),
+    ]
+    tour = Tour.objects.order_by("id").first()
+    if tour:
+        scenarios.append(Scenario("tour_detail", "GET", tour.get_absolute_url()))
+    _, cursor = keyset_page(Review.objects.all(), page_size=3)
+    if cursor:
+        scenarios.append(Scenario(
+            "load_more_reviews", "GET",
+            reverse("load_more_reviews") + "?" + urllib.parse.urlencode({"cursor": cursor}), ajax=True,
+        ))
+    scenarios.append(Scenario(
+        "submit_review", "POST", reverse("submit_review"),
+        data={"name": "Benchmark", "content": "Load test review."}, ajax=True,
+    ))
+    scenarios.append(Scenario(
+        "contact", "POST", reverse("contact"),
+        data={"name": "Benchmark", "email": "bench@example.com", "message": "Load test inquiry."},
+        expect=302,
+    ))
+    return scenarios
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(name, timings, query_counts, wall_seconds=None, unexpected=None):
+    """
+    Latency percentiles; throughput is per wall-clock second when given.
+    `unexpected` maps status codes other than the expected one to how often they came back.
+    """
+    wall_seconds = wall_seconds or sum(timings) / 1000
+    return {
+        "name": name,
+        "requests": len(timings),
+        "rps": round(len(timings) / wall_seconds, 1) if wall_seconds else None,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "max_queries": max(query_counts) if query_counts else None,
+        "unexpected": {str(status): n for status, n in sorted((unexpected or {}).items())},
+    }
+
+
+_client_numbers = itertools.count(1)
+
+
+def _client_address():
+    """A distinct address from the benchmarking range 198.18.0.0/15 per request."""
+    n = next(_client_numbers) % 65536
+    return f"198.18.{n // 256}.{n % 256}"
+
+
+def _unthrottled():
+    return override_settings(THROTTLE_RATES={scope: "1000000/s" for scope in settings.THROTTLE_RATES})
+
+
+def _test_client_host():
+    # Client() sends Host: testserver, which only the test runner allows.
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def _uncached_pages():
+    # Otherwise every GET after the warm-up is a 0-query page-cache hit.
+    return override_settings(PAGE_CACHE_TIMEOUT=0)
+
+
+def run_client(scenarios, iterations):
+    """Drive each scenario in-process and record latency plus exact query counts."""
+    client = Client()
+    results = []
+    with _unthrottled(), _test_client_host(), _uncached_pages():
+        for scenario in scenarios:
+            extra = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"} if scenario.ajax else {}
+            send = client.post if scenario.method == "POST" else client.get
+            send(scenario.path, scenario.data, REMOTE_ADDR=_client_address(), **extra)  # warm caches
+
+            timings, query_counts, unexpected = [], [], Counter()
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = send(scenario.path, scenario.data, REMOTE_ADDR=_client_address(), **extra)
+                    timings.append((time.perf_counter() - start) * 1000)
+                query_counts.append(sum(not is_transaction_control(query["sql"]) for query in queries))
+                if response.status_code != scenario.expect:
+                    unexpected[response.status_code] += 1
+            results.append(summarize(scenario.name, timings, query_counts, unexpected=unexpected))
+    return results
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Time the POST itself, not the page it redirects to."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _NoSessionCookie(DefaultCookiePolicy):
+    """Keep the CSRF cookie but not the session, which the throttle also keys on."""
+
+    def set_ok(self, cookie, request):
+        return cookie.name != settings.SESSION_COOKIE_NAME and super().set_ok(cookie, request)
+
+
+def _http_opener(base_url):
+    """Opener holding a cookie jar with the CSRF token for POSTs."""
+    jar = CookieJar(policy=_NoSessionCookie())
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect)
+    with opener.open(base_url + reverse("csrf")) as response:
+        token = json.load(response)["token"]
+    return opener, token
+
+
+def _http_request(opener, token, base_url, scenario):
+    headers = {"X-CSRFToken": token, "Referer": base_url + "/", "X-Forwarded-For": _client_address()}
+    if scenario.ajax:
+        headers["X-Requested-With"] = "XMLHttpRequest"
+    body = urllib.parse.urlencode(scenario.data).encode() if scenario.method == "POST" else None
+    request = urllib.request.Request(base_url + scenario.path, data=body, headers=headers, method=scenario.method)
+
+    start = time.perf_counter()
+    try:
+        with opener.open(request) as response:
+            response.read()
+            status, timing = response.status, response.headers.get("Server-Timing", "")
+    except urllib.error.HTTPError as exc:  # includes the redirects _NoRedirect declines to follow
+        status, timing = exc.code, exc.headers.get("Server-Timing", "")
+    elapsed = (time.perf_counter() - start) * 1000
+    match = _QUERY_COUNT.search(timing)
+    return elapsed, int(match.group(1)) if match else None, status
+
+
+def run_http(scenarios, iterations, base_url, concurrency):
+    """Fire each scenario `iterations` times at a live server from a thread pool."""
+    base_url = base_url.rstrip("/")
+    opener, token = _http_opener(base_url)
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for scenario in scenarios:
+            start = time.perf_counter()
+            samples = list(pool.map(
+                lambda _: _http_request(opener, token, base_url, scenario), range(iterations)
+            ))
+            wall_seconds = time.perf_counter() - start
+            timings = [elapsed for elapsed, _, _ in samples]
+            query_counts = [count for _, count, _ in samples if count is not None]
+            unexpected = Counter(status for _, _, status in samples if status != scenario.expect)
+            result = summarize(scenario.name, timings, query_counts, wall_seconds, unexpected)
+            result["server"] = base_url
+            results.append(result)
+    return results
+
+
+def unexpected_responses(results):
+    """Human-readable lines for scenarios that got a status they did not expect."""
+    return [
+        f"{result['name']}: " + ", ".join(f"{n}x {status}" for status, n in result["unexpected"].items())
+        + (f" ({result['server']})" if result.get("server") else "")
+        for result in results if result["unexpected"]
+    ]
+
+
+def check_budgets(results, budgets):
+    """Return a list of human-readable budget violations (empty if all pass)."""
+    failures = []
+    for result in results:
+        budget = budgets.get(result["name"])
+        if not budget:
+            continue
+        if "p95_ms" in budget and result["p95_ms"] > budget["p95_ms"]:
+            failures.append(f"{result['name']}: p95 {result['p95_ms']}ms > budget {budget['p95_ms']}ms")
+        if "max_queries" in budget and result["max_queries"] is not None \
+                and result["max_queries"] > budget["max_queries"]:
+            failures.append(
+                f"{result['name']}: {result['max_queries']} queries > budget {budget['max_queries']}"
+            )
+    return failures
+
+
+def load_budgets(path):
+    with open(path) as fh:
+        return json.load(fh)
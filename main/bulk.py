@@ -0,0 +1,20 @@
+"""
+Bulk loads (seed_catalogue, import_jsonl) insert with bulk_create, which
+sends no signals, so afterwards everything the signal handlers would have
+maintained is rebuilt here in one pass.
+"""
+from .cache import bump_catalogue_version, bump_reviews_version
+from .counters import REVIEWS, reconcile
+from .ratings import rebuild_ratings
+from .search import rebuild_index, rebuild_review_index
+from .sitemap import tours_loaded
+
+
+def refresh_after_bulk_load():
+    rebuild_index()
+    rebuild_review_index()
+    reconcile(REVIEWS)
+    rebuild_ratings()
+    bump_catalogue_version()
+    bump_reviews_version()
+    tours_loaded()
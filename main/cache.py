@@ -0,0 +1,110 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+CATALOGUE_VERSION_KEY = "catalogue:version"
+REVIEWS_VERSION_KEY = "reviews:version"
+RATINGS_VERSION_KEY = "ratings:version"
+
+
+def _fresh_version():
+    # Seed from the clock so a cache flush never resurrects an older version.
+    return int(time.time() * 1000)
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(key, version, None)
+        return version
+
+
+def catalogue_version():
+    """
+    Current catalogue version. Cache keys for anything rendered from Tour or
+    TourImage data include it, so bumping it invalidates them all at once.
+    """
+    return _version(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue fragment."""
+    return _bump(CATALOGUE_VERSION_KEY)
+
+
+def reviews_version():
+    """Current review feed version, bumped whenever a review changes."""
+    return _version(REVIEWS_VERSION_KEY)
+
+
+def bump_reviews_version():
+    return _bump(REVIEWS_VERSION_KEY)
+
+
+def ratings_version():
+    """
+    Bumped whenever any tour's rating changes. Only whole-page caches that
+    show ratings use it; card fragments key on TourRating.modified_at.
+    """
+    return _version(RATINGS_VERSION_KEY)
+
+
+def bump_ratings_version():
+    return _bump(RATINGS_VERSION_KEY)
+
+
+def cache_public_page(*version_funcs):
+    """
+    Cache the whole response of a GET view for visitors, keyed by URL,
+    staff status and the given content versions (e.g. catalogue_version),
+    so a hit skips the ORM and the template engine entirely.
+
+    Requests with pending flash messages are always rendered, and responses
+    that set cookies or are not 200s are never stored. Cached pages must not
+    embed per-user data such as CSRF tokens; forms fetch those from /csrf/.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if not timeout or request.method not in ("GET", "HEAD") or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            is_staff = getattr(request.user, "is_staff", False)
+            versions = ".".join(str(func()) for func in version_funcs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f"page:{path}:{int(is_staff)}:{versions}"
+
+            response = cache.get(key)
+            if response is not None:
+                response["X-Page-Cache"] = "hit"
+                return get_conditional_response(
+                    request,
+                    etag=response.get("ETag"),
+                    last_modified=parse_http_date_safe(response.get("Last-Modified", "")),
+                    response=response,
+                )
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies and not response.streaming:
+                cache.set(key, response, timeout)
+                response["X-Page-Cache"] = "miss"
+            return response
+        return wrapper
+    return decorator
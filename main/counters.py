@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Counter, Review
+
+REVIEWS = "reviews"  # visible reviews only
+
+# Counter name -> function returning the true value, used by reconcile().
+SOURCES = {
+    REVIEWS: lambda: Review.objects.filter(is_hidden=False).count(),
+}
+
+
+def get_count(name):
+    """Read a counter: a single primary-key lookup."""
+    value = Counter.objects.filter(name=name).values_list("value", flat=True).first()
+    return value or 0
+
+
+def adjust(name, delta):
+    """Atomically add delta (may be negative) to a counter."""
+    if not Counter.objects.filter(name=name).update(value=F("value") + delta):
+        # First use of this counter: start it from the real value.
+        reconcile(name)
+
+
+def reconcile(name):
+    """Recompute a counter from its source; returns the drift that was fixed."""
+    with transaction.atomic():
+        actual = SOURCES[name]()
+        counter, created = Counter.objects.select_for_update().get_or_create(name=name, defaults={"value": actual})
+        drift = 0 if created else actual - counter.value
+        if drift:
+            counter.value = actual
+            counter.save(update_fields=["value"])
+    return drift
@@ -0,0 +1,112 @@
+"""
+In-process broadcaster for the live review stream (server-sent events).
+
+Review signal handlers publish once per committed change and every open
+stream gets a copy through its own bounded asyncio.Queue, so connected pages
+never poll the database. Publishing may happen on any thread (sync views,
+the admin, sync_to_async workers); messages are handed to each stream's
+event loop with call_soon_threadsafe.
+
+Backpressure: a client that stops reading fills its queue; instead of
+buffering without limit, its backlog is dropped and replaced by a single
+"resync" event telling the page to reload the list once.
+
+Each process has its own broadcaster, so with several ASGI workers a page
+only sees changes made through the worker serving its stream (plus the
+admin/other workers' changes on its next resync or reload).
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+def format_event(event, data):
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+RESYNC = format_event("resync", {})
+
+
+class Subscription:
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, message):
+        """Runs on the subscriber's loop."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def full(self):
+        return len(self._subscriptions) >= settings.REVIEW_STREAM_MAX_CLIENTS
+
+    def subscribe(self):
+        """Register the calling coroutine's stream; raises TooManyStreams at the cap."""
+        with self._lock:
+            if self.full():
+                raise TooManyStreams
+            subscription = Subscription(asyncio.get_running_loop(), settings.REVIEW_STREAM_QUEUE_SIZE)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event, data):
+        """Fan an event out to every stream. Safe to call from any thread."""
+        message = format_event(event, data)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:  # the stream's loop has already closed
+                self.unsubscribe(subscription)
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(heartbeat):
+    """
+    Async iterator of SSE text for one subscriber, with keep-alive comments.
+    It subscribes when iteration starts, so a client that goes away before
+    the body is sent never holds a slot.
+    """
+    try:
+        subscription = broadcaster.subscribe()
+    except TooManyStreams:
+        # The view saw a free slot but another stream took it: reconnect later.
+        yield "retry: 30000\n\n"
+        return
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"  # also lets us notice clients that went away
+                continue
+            yield message
+    finally:
+        broadcaster.unsubscribe(subscription)
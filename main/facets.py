@@ -0,0 +1,113 @@
+"""
+Faceted filtering for the tours page: location, price band and trip length.
+
+Every option's count comes from one aggregate() with a conditional COUNT
+per option, so a page view costs one query however many options there are.
+Counts are disjunctive: each facet's counts apply the selections in the
+*other* facets, so after picking a price band the other bands still show
+what picking them instead would give. The location options themselves are
+cached per catalogue version.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import catalogue_version
+from .models import Tour
+
+# (value, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ("under-1000", "Under $1,000", None, 1000),
+    ("1000-2500", "$1,000 – $2,500", 1000, 2500),
+    ("2500-5000", "$2,500 – $5,000", 2500, 5000),
+    ("5000-plus", "$5,000+", 5000, None),
+]
+
+# (value, label, fewest days, most days), both inclusive
+DURATION_BANDS = [
+    ("1-3", "1–3 days", 1, 3),
+    ("4-7", "4–7 days", 4, 7),
+    ("8-14", "8–14 days", 8, 14),
+    ("15-plus", "15+ days", 15, None),
+]
+
+
+def location_options():
+    """Distinct tour locations, read once per catalogue version."""
+    key = f"tours:locations:{catalogue_version()}"
+    locations = cache.get(key)
+    if locations is None:
+        locations = list(Tour.objects.order_by("location").values_list("location", flat=True).distinct())
+        cache.set(key, locations, settings.TOUR_FRAGMENT_CACHE_TIMEOUT)
+    return locations
+
+
+def _price_q(lower, upper):
+    q = Q()
+    if lower is not None:
+        q &= Q(price__gte=lower)
+    if upper is not None:
+        q &= Q(price__lt=upper)
+    return q
+
+
+def _duration_q(lower, upper):
+    q = Q(duration_days__gte=lower)
+    if upper is not None:
+        q &= Q(duration_days__lte=upper)
+    return q
+
+
+def _options():
+    """facet -> [(value, label, condition), ...]"""
+    return {
+        "location": [(loc, loc, Q(location=loc)) for loc in location_options()],
+        "price": [(value, label, _price_q(lo, hi)) for value, label, lo, hi in PRICE_BANDS],
+        "duration": [(value, label, _duration_q(lo, hi)) for value, label, lo, hi in DURATION_BANDS],
+    }
+
+
+class TourFacets:
+    """Selected filters from the query string, and their counts."""
+
+    names = ("location", "price", "duration")
+    any_labels = {"location": "Any location", "price": "Any price", "duration": "Any length"}
+
+    def __init__(self, params):
+        self.options = _options()
+        self.selected = {}
+        for name in self.names:
+            value = params.get(name, "")
+            conditions = {v: q for v, _, q in self.options[name]}
+            if value in conditions:  # unknown values are ignored, not errors
+                self.selected[name] = (value, conditions[value])
+
+    def _others(self, facet):
+        return [q for name, (_, q) in self.selected.items() if name != facet]
+
+    def filter(self, queryset):
+        return queryset.filter(*[q for _, q in self.selected.values()])
+
+    def counts(self, queryset):
+        """
+        [{"name", "any_label", "selected", "options": [{"value", "label", "count"}]}] for
+        every facet, from a single aggregate over `queryset` (unfiltered by
+        the facets themselves).
+        """
+        aggregates = {}
+        for name in self.names:
+            for i, (_, _, q) in enumerate(self.options[name]):
+                aggregates[f"{name}_{i}"] = Count("pk", filter=Q(q, *self._others(name)))
+        totals = queryset.order_by().aggregate(**aggregates)
+        return [
+            {
+                "name": name,
+                "any_label": self.any_labels[name],
+                "selected": self.selected.get(name, ("",))[0],
+                "options": [
+                    {"value": value, "label": label, "count": totals[f"{name}_{i}"]}
+                    for i, (value, label, _) in enumerate(self.options[name])
+                ],
+            }
+            for name in self.names
+        ]
@@ -0,0 +1,55 @@
+"""
+NDJSON partner feed of the tour catalogue.
+
+One JSON object per tour, streamed from a chunked queryset so memory stays
+flat however large the catalogue gets. Tours come out oldest change first;
+a partner passes the largest `modified_at` it has seen as `?since=` to fetch
+only what changed. Deleted tours are not reported, so partners should still
+do an occasional full sync.
+"""
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Tour
+
+FEED_VERSION = 1
+
+
+def _file_url(request, field):
+    return request.build_absolute_uri(field.url) if field else None
+
+
+def tour_record(request, tour):
+    return {
+        "id": tour.id,
+        "slug": tour.slug,
+        "name": tour.name,
+        "location": tour.location,
+        "description": tour.description,
+        "detailed_info": tour.detailed_info,
+        "duration": tour.duration,
+        "price": tour.price,
+        "is_featured": tour.is_featured,
+        "url": request.build_absolute_uri(tour.get_absolute_url()),
+        "image": _file_url(request, tour.image),
+        "gallery": [
+            {"url": _file_url(request, img.image), "caption": img.caption}
+            for img in tour.gallery.all()
+        ],
+        "modified_at": tour.modified_at,
+    }
+
+
+def feed_lines(request, since=None):
+    """Yield the feed as encoded NDJSON lines."""
+    tours = Tour.objects.order_by("modified_at", "pk").prefetch_related("gallery")
+    if since is not None:
+        tours = tours.filter(modified_at__gt=since)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    # With a chunk size, iterator() runs the gallery prefetch once per chunk.
+    for tour in tours.iterator(chunk_size=settings.TOUR_FEED_CHUNK_SIZE):
+        yield (encoder.encode(tour_record(request, tour)) + "\n").encode()
+
+
+def wants_gzip(request):
+    return "gzip" in request.headers.get("Accept-Encoding", "")
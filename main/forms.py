@@ -1,12 +1,23 @@
 from django import forms
+from django.conf import settings
+
 from .models import Review
+from .moderation import ACTIONS
 
 
 class ReviewForm(forms.ModelForm):
     class Meta:
         model = Review
-        fields = ['name', 'content']
+        fields = ['name', 'content', 'rating', 'tour']
         widgets = {
+            'tour': forms.HiddenInput(),
+            'rating': forms.Select(attrs={
+                'aria-label': 'Your rating',
+                'class': (
+                    'w-full p-3 rounded bg-black/40 border border-gray-400 text-yellow-400 '
+                    'focus:outline-none focus:ring-2 focus:ring-yellow-400'
+                )
+            }),
             'name': forms.TextInput(attrs={
                 'placeholder': 'Your name (optional)',
                 'aria-label': 'Your name',
@@ -55,3 +66,51 @@ class ReviewForm(forms.ModelForm):
                     css = bound_field.field.widget.attrs.get("class", "")
                     if "border-red-500" not in css:
                         bound_field.field.widget.attrs["class"] = css + " border-red-500"
+
+
+class ModerationForm(forms.Form):
+    """
+    Which reviews the bulk moderation endpoint acts on: explicit ids, or a
+    filter (reviewer name, text, time window). Filters combine with AND; at
+    least one id or filter is required, so an empty request never matches
+    every review.
+    """
+    action = forms.ChoiceField(choices=[(a, a) for a in ACTIONS])
+    ids = forms.CharField(required=False, help_text="Comma-separated review ids.")
+    name = forms.CharField(required=False, max_length=100)
+    contains = forms.CharField(required=False, max_length=300)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+
+    def clean_ids(self):
+        raw = self.cleaned_data["ids"].replace(",", " ").split()
+        if not all(part.isdigit() for part in raw):
+            raise forms.ValidationError("Review ids must be numbers.")
+        if len(raw) > settings.REVIEW_MODERATION_MAX_IDS:
+            raise forms.ValidationError(
+                f"At most {settings.REVIEW_MODERATION_MAX_IDS} ids per request; use a filter for more."
+            )
+        return sorted({int(part) for part in raw})
+
+    def clean(self):
+        cleaned = super().clean()
+        if not any(cleaned.get(field) for field in ("ids", "name", "contains", "since", "until")):
+            raise forms.ValidationError("Select some reviews or give a filter.")
+        return cleaned
+
+    def reviews(self):
+        """The matching reviews (call after is_valid())."""
+        data = self.cleaned_data
+        reviews = Review.objects.all()
+        if data["ids"]:
+            reviews = reviews.filter(pk__in=data["ids"])
+        if data["name"]:
+            reviews = reviews.filter(name__iexact=data["name"])
+        if data["contains"]:
+            reviews = reviews.filter(content__icontains=data["contains"])
+        if data["since"]:
+            reviews = reviews.filter(created_at__gte=data["since"])
+        if data["until"]:
+            reviews = reviews.filter(created_at__lt=data["until"])
+        return reviews
+
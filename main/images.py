@@ -0,0 +1,149 @@
+"""
+Responsive image renditions for Tour.image and TourImage.image.
+
+Each upload is resized to the widths in IMAGE_RENDITION_WIDTHS and encoded in
+every format listed in IMAGE_RENDITION_FORMATS (WebP by default, AVIF when
+Pillow supports it). The files are written through the image field's own
+storage, so this works the same on the local filesystem and on
+MediaCloudinaryStorage. Their names and dimensions are kept in the model's
+`image_renditions` JSON field, which the {% srcset %} tag reads without
+touching storage.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import bump_catalogue_version
+
+logger = logging.getLogger(__name__)
+
+_PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+
+def _enabled_formats():
+    return [fmt for fmt in settings.IMAGE_RENDITION_FORMATS if features.check(fmt)]
+
+
+def rendition_name(source_name, width, fmt):
+    stem, _ = os.path.splitext(source_name)
+    return f"renditions/{stem}-{width}w.{fmt}"
+
+
+def renditions_current(obj):
+    """True when obj.image_renditions were generated from the current upload."""
+    renditions = obj.image_renditions or []
+    if not obj.image:
+        return not renditions
+    return bool(renditions) and all(r["source"] == obj.image.name for r in renditions)
+
+
+def build_renditions(fieldfile):
+    """Resize and encode one uploaded image; returns the rendition records."""
+    storage = fieldfile.storage
+    with fieldfile.open("rb") as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+
+    widths = sorted({min(width, original.width) for width in settings.IMAGE_RENDITION_WIDTHS})
+    records = []
+    for fmt in _enabled_formats():
+        for width in widths:
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS) if width != original.width else original
+            buffer = BytesIO()
+            resized.save(buffer, _PIL_FORMATS[fmt], quality=settings.IMAGE_RENDITION_QUALITY)
+
+            name = rendition_name(fieldfile.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(buffer.getvalue()))
+            records.append({
+                "source": fieldfile.name, "name": name, "format": fmt,
+                "width": width, "height": height, "bytes": buffer.tell(),
+            })
+    return records
+
+
+def refresh_renditions(obj, force=False):
+    """
+    Regenerate obj's renditions if its image changed (or force is set).
+
+    Saves through queryset.update() so no post_save handlers run again, and
+    invalidates the pages that embed the image. Returns True if anything changed.
+    """
+    if not force and renditions_current(obj):
+        return False
+
+    stale = {r["name"] for r in obj.image_renditions or []}
+    records = build_renditions(obj.image) if obj.image else []
+    for name in stale - {r["name"] for r in records}:
+        obj.image.storage.delete(name)
+
+    obj.image_renditions = records
+    type(obj).objects.filter(pk=obj.pk).update(image_renditions=records)
+
+    Tour = apps.get_model("main", "Tour")
+    tour_id = obj.pk if isinstance(obj, Tour) else obj.tour_id
+    Tour.objects.filter(pk=tour_id).update(modified_at=timezone.now())
+    bump_catalogue_version()
+    return True
+
+
+def refresh_renditions_by_pk(model_label, pk, force=False):
+    """Process-pool entry point used by the generate_renditions command."""
+    if not apps.ready:  # spawned workers start without Django loaded
+        import django
+        django.setup()
+
+    obj = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if obj is None:
+        return False
+    try:
+        return refresh_renditions(obj, force=force)
+    except Exception:
+        logger.exception("Could not build renditions for %s #%s", model_label, pk)
+        return False
+
+
+def _pick(obj, fmt):
+    return sorted(
+        (r for r in obj.image_renditions or [] if r["format"] == fmt and obj.image and r["source"] == obj.image.name),
+        key=lambda r: r["width"],
+    )
+
+
+def srcset(obj, fmt="webp"):
+    """`srcset` attribute value for obj's renditions in one format ('' if none)."""
+    storage = obj.image.storage if obj.image else None
+    return ", ".join(f"{storage.url(r['name'])} {r['width']}w" for r in _pick(obj, fmt))
+
+
+def rendition_url(obj, width, fmt="webp"):
+    """URL of the smallest rendition at least `width` wide, else the original."""
+    if not obj.image:
+        return ""
+    candidates = _pick(obj, fmt)
+    for record in candidates:
+        if record["width"] >= width:
+            return obj.image.storage.url(record["name"])
+    return obj.image.storage.url(candidates[-1]["name"]) if candidates else obj.image.url
+
+
+def thumbnail_url(obj, width=160, fmt="webp"):
+    """
+    Like rendition_url() but never falls back to the original upload, so a
+    list of previews can't pull full-size images; '' until renditions exist.
+    """
+    candidates = _pick(obj, fmt) if obj.image else []
+    for record in candidates:
+        if record["width"] >= width:
+            return obj.image.storage.url(record["name"])
+    return obj.image.storage.url(candidates[-1]["name"]) if candidates else ""
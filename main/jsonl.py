@@ -0,0 +1,174 @@
+"""
+Streaming JSONL export/import of tours, gallery images and reviews.
+
+One object per line: {"model": "main.tour", "fields": {...}}. References to a
+tour are written as its slug, so files can move between databases. Both
+directions work in fixed-size chunks and never hold the whole file or table
+in memory. Imports go through bulk_create, so no model signals fire (no
+review notification emails); callers refresh the derived data afterwards.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+from .models import Review, Tour, TourImage, parse_duration_days
+
+TOUR_FIELDS = ("slug", "name", "location", "description", "detailed_info", "image", "duration", "price", "is_featured")
+IMAGE_FIELDS = ("image", "caption")
+REVIEW_FIELDS = ("name", "content", "rating", "is_hidden", "created_at")
+
+# Export order; imports rely on tours appearing before what points at them.
+MODELS = {
+    "main.tour": (Tour, TOUR_FIELDS),
+    "main.tourimage": (TourImage, IMAGE_FIELDS),
+    "main.review": (Review, REVIEW_FIELDS),
+}
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def export_jsonl(out, labels=tuple(MODELS), chunk_size=2000):
+    """Write every row of the given models to the text stream `out`."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    written = 0
+    for label in labels:
+        model, fields = MODELS[label]
+        if model is not Tour:
+            fields = fields + ("tour__slug",)
+        for row in model.objects.order_by("pk").values(*fields).iterator(chunk_size=chunk_size):
+            if "tour__slug" in row:
+                row["tour"] = row.pop("tour__slug")
+            out.write(encoder.encode({"model": label, "fields": row}) + "\n")
+            written += 1
+    return written
+
+
+def _build(model, fields, data):
+    return model(**{
+        name: model._meta.get_field(name).to_python(data[name])
+        for name in fields if data.get(name) is not None
+    })
+
+
+class Importer:
+    """Buffers records per model and writes them in batches."""
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.tours = {}  # slug -> Tour, so a batch never upserts one slug twice
+        self.images = []
+        self.reviews = []
+        self.counts = {"tours": 0, "images": 0, "reviews": 0, "skipped": 0}
+
+    def add(self, label, data):
+        if label not in MODELS:
+            raise InvalidRecord(f"unknown model {label!r}")
+        if label == "main.tour":
+            tour = _build(Tour, TOUR_FIELDS, data)
+            tour.slug = tour.slug or slugify(tour.name)
+            tour.duration_days = parse_duration_days(tour.duration)  # bulk_create skips Tour.save()
+            self.tours[tour.slug] = tour
+        elif label == "main.tourimage":
+            self.images.append((data.get("tour"), _build(TourImage, IMAGE_FIELDS, data)))
+        else:
+            self.reviews.append((data.get("tour"), _build(Review, REVIEW_FIELDS, data)))
+
+    def full(self):
+        return max(len(self.tours), len(self.images), len(self.reviews)) >= self.batch_size
+
+    def flush(self):
+        with transaction.atomic():
+            self._flush_tours()
+            self._flush_images()
+            self._flush_reviews()
+
+    def _tour_ids(self, pending):
+        slugs = {slug for slug, _ in pending if slug}
+        return dict(Tour.objects.filter(slug__in=slugs).values_list("slug", "pk")) if slugs else {}
+
+    def _flush_tours(self):
+        if not self.tours:
+            return
+        Tour.objects.bulk_create(
+            self.tours.values(),
+            update_conflicts=True,
+            unique_fields=["slug"],
+            update_fields=[name for name in TOUR_FIELDS if name != "slug"] + ["duration_days", "modified_at"],
+        )
+        self.counts["tours"] += len(self.tours)
+        self.tours = {}
+
+    def _flush_images(self):
+        if not self.images:
+            return
+        tour_ids = self._tour_ids(self.images)
+        # Re-importing the same file must not duplicate gallery rows.
+        existing = set(
+            TourImage.objects.filter(tour_id__in=tour_ids.values()).values_list("tour_id", "image")
+        )
+        new = []
+        for slug, image in self.images:
+            image.tour_id = tour_ids.get(slug)
+            key = (image.tour_id, image.image.name)
+            if image.tour_id is None or key in existing:
+                self.counts["skipped"] += 1
+                continue
+            existing.add(key)
+            new.append(image)
+        TourImage.objects.bulk_create(new)
+        self.counts["images"] += len(new)
+        self.images = []
+
+    def _flush_reviews(self):
+        if not self.reviews:
+            return
+        tour_ids = self._tour_ids(self.reviews)
+        exported = []
+        for slug, review in self.reviews:
+            review.tour_id = tour_ids.get(slug)
+            exported.append(review.created_at)
+        # created_at is auto_now_add, so bulk_create stamps it with the current
+        # time; put the exported timestamps back afterwards.
+        reviews = Review.objects.bulk_create([review for _, review in self.reviews])
+        dated = []
+        for review, created_at in zip(reviews, exported):
+            if created_at is not None:
+                review.created_at = created_at
+                dated.append(review)
+        Review.objects.bulk_update(dated, ["created_at"], batch_size=self.batch_size)
+        self.counts["reviews"] += len(self.reviews)
+        self.reviews = []
+
+
+def _flush(importer, first, last):
+    # A batch the database refuses is rolled back whole; earlier batches stay.
+    try:
+        importer.flush()
+    except IntegrityError as exc:
+        raise InvalidRecord(f"lines {first}-{last}: {exc}") from exc
+
+
+def import_jsonl(lines, batch_size=2000):
+    """Load records from an iterable of JSONL lines; returns per-kind counts."""
+    importer = Importer(batch_size)
+    first = None  # first line of the pending batch
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        first = first or number
+        try:
+            record = json.loads(line)
+            importer.add(record["model"], record["fields"])
+        except (ValueError, KeyError, TypeError, ValidationError) as exc:
+            raise InvalidRecord(f"line {number}: {exc}") from exc
+        if importer.full():
+            _flush(importer, first, number)
+            first = None
+    if first:
+        _flush(importer, first, number)
+    return importer.counts
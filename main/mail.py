@@ -0,0 +1,124 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed batch stays invisible to other workers while it is sent.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Queue an email for background delivery. Same arguments as send_mail().
+
+    The row is written in the caller's transaction, so a rolled-back request
+    never sends mail and a committed one is never lost.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+async def aenqueue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Async enqueue_mail() for async views; only the outbox INSERT is awaited."""
+    return await OutboundEmail.objects.acreate(
+        subject=subject,
+        body=message,
+        html_body=html_message or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def backoff_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base ... capped at one day."""
+    base = settings.EMAIL_OUTBOX_BACKOFF_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 24 * 60 * 60))
+
+
+def claim_batch(batch_size):
+    """
+    Reserve up to batch_size due messages for this worker.
+
+    Claimed rows have their next_attempt_at pushed forward by CLAIM_LEASE so
+    that concurrent workers skip them; if this worker dies mid-batch they
+    become due again once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(
+            next_attempt_at=now + CLAIM_LEASE
+        )
+    return batch
+
+
+def _record_failure(message, error, max_attempts):
+    message.attempts += 1
+    message.last_error = error
+    if message.attempts >= max_attempts:
+        message.status = OutboundEmail.STATUS_DEAD
+        logger.error("Email %s moved to dead letters after %s attempts: %s", message.pk, message.attempts, error)
+    else:
+        message.next_attempt_at = timezone.now() + backoff_delay(message.attempts)
+    message.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def send_queued_mail(batch_size=None, max_attempts=None):
+    """
+    Deliver one batch of due messages over a single SMTP connection.
+    Returns a (sent, failed) tuple.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        for message in batch:
+            _record_failure(message, f"connection failed: {exc}", max_attempts)
+        return 0, len(batch)
+
+    try:
+        for message in batch:
+            email = EmailMultiAlternatives(
+                message.subject, message.body, message.from_email, message.to,
+                connection=connection,
+            )
+            if message.html_body:
+                email.attach_alternative(message.html_body, "text/html")
+            try:
+                email.send()
+            except Exception as exc:
+                _record_failure(message, str(exc), max_attempts)
+                failed += 1
+            else:
+                message.status = OutboundEmail.STATUS_SENT
+                message.sent_at = timezone.now()
+                message.save(update_fields=['status', 'sent_at'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,71 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmark import (
+    check_budgets, default_scenarios, load_budgets, run_client, run_http, unexpected_responses,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p95/p99 latency and query counts for the public views and "
+        "fail if any per-URL budget in perf_budgets.json is exceeded or a request "
+        "gets an unexpected status."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["client", "http"], default="client",
+                            help="client: in-process test client; http: threaded requests to --base-url.")
+        parser.add_argument("--base-url", nargs="+", default=["http://127.0.0.1:8000"],
+                            help="Server(s) for http mode; give several to compare them side by side.")
+        parser.add_argument("--only", nargs="+", metavar="SCENARIO",
+                            help="Run just these scenarios, e.g. --only contact submit_review.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=8, help="Threads used in http mode.")
+        parser.add_argument("--budgets", default=str(settings.BASE_DIR / "perf_budgets.json"))
+        parser.add_argument("--no-budgets", action="store_true", help="Report only, never fail.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        # The per-request log lines would drown out the report.
+        logging.getLogger("main.performance").setLevel(logging.WARNING)
+
+        scenarios = default_scenarios()
+        if options["only"]:
+            scenarios = [scenario for scenario in scenarios if scenario.name in options["only"]]
+        if options["mode"] == "http":
+            results = []
+            for base_url in options["base_url"]:
+                results += run_http(scenarios, options["iterations"], base_url, options["concurrency"])
+        else:
+            results = run_client(scenarios, options["iterations"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            server = object()  # print a header before the first row and per server
+            for r in results:
+                if r.get("server") != server:
+                    server = r.get("server")
+                    if server:
+                        self.stdout.write(f"\n{server}")
+                    self.stdout.write(f"{'scenario':<20}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'queries':>9}")
+                queries = "-" if r["max_queries"] is None else r["max_queries"]
+                self.stdout.write(
+                    f"{r['name']:<20}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['rps']:>9}{queries:>9}"
+                )
+
+        # Timings of error pages say nothing about the view; never report them as a pass.
+        unexpected = unexpected_responses(results)
+        if unexpected:
+            raise CommandError("Unexpected response status:\n  " + "\n  ".join(unexpected))
+
+        if options["no_budgets"]:
+            return
+        failures = check_budgets(results, load_budgets(options["budgets"]))
+        if failures:
+            raise CommandError("Latency budget exceeded:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All budgets met"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.sitemap import build_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild every sitemap file in storage (tour saves and deletes keep them current afterwards)."
+
+    def handle(self, *args, **options):
+        shards, urls = build_all()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {urls} tour URL(s) in {shards} shard(s), plus pages and index"))
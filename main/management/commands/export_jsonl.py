@@ -0,0 +1,33 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.jsonl import MODELS, export_jsonl
+
+
+def open_text(path, mode):
+    """Open `path` for text I/O; "-" is stdin/stdout and *.gz is gzipped."""
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Command(BaseCommand):
+    help = "Stream tours, gallery images and reviews to a JSONL file (use .gz to compress, - for stdout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        out = self.stdout if options["path"] == "-" else open_text(options["path"], "w")
+        try:
+            written = export_jsonl(out, options["models"], options["chunk_size"])
+        finally:
+            if out is not self.stdout:
+                out.close()
+        self.stderr.write(f"Exported {written} record(s)")
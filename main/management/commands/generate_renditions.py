@@ -0,0 +1,35 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main.images import refresh_renditions_by_pk
+from main.models import Tour, TourImage
+
+
+class Command(BaseCommand):
+    help = "Generate responsive WebP/AVIF renditions for tour and gallery images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Size of the process pool (1 = run inline).")
+        parser.add_argument("--force", action="store_true", help="Rebuild renditions that are already current.")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in (Tour, TourImage):
+            pks = model.objects.exclude(image="").exclude(image__isnull=True).values_list("pk", flat=True)
+            jobs.extend((model._meta.label, pk) for pk in pks.iterator())
+        self.stdout.write(f"Processing {len(jobs)} image(s)")
+
+        if options["workers"] <= 1:
+            changed = sum(refresh_renditions_by_pk(label, pk, options["force"]) for label, pk in jobs)
+        else:
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            changed = 0
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                futures = [pool.submit(refresh_renditions_by_pk, label, pk, options["force"]) for label, pk in jobs]
+                for future in as_completed(futures):
+                    changed += bool(future.result())
+
+        self.stdout.write(self.style.SUCCESS(f"Updated renditions for {changed} image(s)"))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bulk import refresh_after_bulk_load
+from main.jsonl import InvalidRecord, import_jsonl
+
+from .export_jsonl import open_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tours, gallery images and reviews from a JSONL export in batches. "
+        "Tours are upserted by slug; no signals (or notification emails) fire."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file, optionally .gz, or - for stdin.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = open_text(options["path"], "r")
+        try:
+            counts = import_jsonl(lines, options["batch_size"])
+        except InvalidRecord as exc:
+            refresh_after_bulk_load()
+            raise CommandError(f"Import stopped at {exc}; earlier batches were kept.")
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+        refresh_after_bulk_load()
+        self.stdout.write(self.style.SUCCESS(
+            "Imported {tours} tour(s), {images} image(s), {reviews} review(s); skipped {skipped}".format(**counts)
+        ))
+        if counts["tours"] or counts["images"]:
+            self.stdout.write("Run `manage.py generate_renditions` to build image renditions.")
+
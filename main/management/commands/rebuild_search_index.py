@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main.search import rebuild_index, rebuild_review_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search indexes for tours and reviews (after imports or raw SQL edits)."
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} tour(s)"))
+        count = rebuild_review_index()
+        if count is None:
+            self.stdout.write("Reviews: indexed by the database, nothing to rebuild")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Indexed {count} review(s)"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import SOURCES, reconcile
+from main.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute materialized counters and tour ratings from the source tables and repair any drift."
+
+    def handle(self, *args, **options):
+        for name in SOURCES:
+            drift = reconcile(name)
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{name}: corrected drift of {drift:+d}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+
+        rated = rebuild_ratings()
+        self.stdout.write(f"ratings: rebuilt ({rated} rated tour(s))")
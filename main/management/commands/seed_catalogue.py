@@ -0,0 +1,99 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.bulk import refresh_after_bulk_load
+from main.models import Review, Tour, TourImage
+from main.moderation import DELETE, moderate
+
+SEED_SLUG_PREFIX = "seed-"
+
+PLACES = [
+    ("Masai Mara", "Kenya"), ("Amboseli", "Kenya"), ("Samburu", "Kenya"), ("Tsavo", "Kenya"),
+    ("Serengeti", "Tanzania"), ("Ngorongoro", "Tanzania"), ("Zanzibar", "Tanzania"),
+    ("Bwindi", "Uganda"), ("Queen Elizabeth", "Uganda"), ("Volcanoes", "Rwanda"),
+]
+KINDS = ["Safari", "Migration Safari", "Gorilla Trek", "Beach Escape", "Photo Safari", "Family Adventure"]
+WORDS = (
+    "lion leopard elephant rhino buffalo cheetah giraffe zebra wildebeest hippo flamingo "
+    "sunrise sunset savannah river crater lodge camp guide balloon walking game drive"
+).split()
+NAMES = ["Amina", "Brian", "Chloe", "David", "Esther", "Farah", "George", "Hannah", None]
+IMAGES = ["tours/safari-bg.jpg", "tours/crossroad-car-safari-scene.jpg"]
+GALLERY_IMAGES = ["tours/gallery/mission.jpg", "tours/gallery/safari-bg.jpg", "tours/gallery/tours-hero.jpg"]
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic catalogue (tours, gallery images, reviews) for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tours", type=int, default=100)
+        parser.add_argument("--gallery", type=int, default=3, help="Gallery images per tour.")
+        parser.add_argument("--reviews", type=int, default=1000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for repeatable catalogues.")
+        parser.add_argument("--clear", action="store_true", help=f"Delete previously seeded tours ({SEED_SLUG_PREFIX}*) first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        if options["clear"]:
+            # Review.tour is SET_NULL, so the seeded reviews would outlive their tours.
+            seeded = Tour.objects.filter(slug__startswith=SEED_SLUG_PREFIX)
+            deleted = moderate(Review.objects.filter(tour__in=seeded), DELETE)
+            deleted += seeded.delete()[0]
+            self.stdout.write(f"Deleted {deleted} seeded row(s)")
+
+        start = Tour.objects.filter(slug__startswith=SEED_SLUG_PREFIX).count()
+        for offset in range(0, options["tours"], batch_size):
+            size = min(batch_size, options["tours"] - offset)
+            with transaction.atomic():
+                tours = Tour.objects.bulk_create(
+                    [self.make_tour(rng, start + offset + i) for i in range(size)], batch_size=batch_size
+                )
+                if options["gallery"]:
+                    TourImage.objects.bulk_create([
+                        TourImage(tour=tour, image=rng.choice(GALLERY_IMAGES), caption=self.sentence(rng, 3))
+                        for tour in tours for _ in range(options["gallery"])
+                    ], batch_size=batch_size)
+            self.stdout.write(f"  tours: {offset + size}/{options['tours']}")
+
+        tour_ids = list(Tour.objects.filter(slug__startswith=SEED_SLUG_PREFIX).values_list("pk", flat=True))
+        for offset in range(0, options["reviews"], batch_size):
+            size = min(batch_size, options["reviews"] - offset)
+            Review.objects.bulk_create([
+                Review(
+                    name=rng.choice(NAMES),
+                    content=self.sentence(rng, rng.randint(8, 30))[:300],
+                    tour_id=rng.choice(tour_ids) if tour_ids else None,
+                    rating=rng.choices((5, 4, 3, 2, 1), weights=(50, 30, 10, 6, 4))[0],
+                )
+                for _ in range(size)
+            ], batch_size=batch_size)
+            self.stdout.write(f"  reviews: {offset + size}/{options['reviews']}")
+
+        refresh_after_bulk_load()
+        self.stdout.write(self.style.SUCCESS("Seeding complete"))
+
+    def sentence(self, rng, length):
+        return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+    def make_tour(self, rng, number):
+        place, country = rng.choice(PLACES)
+        name = f"{place} {rng.choice(KINDS)} #{number}"
+        days = rng.randint(2, 14)
+        return Tour(
+            name=name,
+            slug=f"{SEED_SLUG_PREFIX}{number}",
+            location=f"{place}, {country}",
+            description=self.sentence(rng, rng.randint(20, 60)),
+            detailed_info="".join(f"<p>{self.sentence(rng, 40)}</p>" for _ in range(3)),
+            image=rng.choice(IMAGES),
+            duration=f"{days} Days {days - 1} Nights",
+            duration_days=days,  # bulk_create skips Tour.save()
+            price=Decimal(rng.randrange(300, 8000, 50)),
+            is_featured=rng.random() < 0.05,
+        )
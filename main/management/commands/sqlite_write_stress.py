@@ -0,0 +1,57 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from main.models import Review
+
+STRESS_NAME_PREFIX = "stress-worker-"
+
+
+def write_reviews(worker, writes):
+    """Body of one forked worker: write reviews like a gunicorn worker would."""
+    connections.close_all()  # never reuse the parent's connection after fork
+    ok = errors = 0
+    for i in range(writes):
+        try:
+            with transaction.atomic():
+                # Read-then-write, like an admin edit: with a deferred BEGIN the
+                # lock upgrade fails immediately when another writer is active.
+                Review.objects.filter(name=f"{STRESS_NAME_PREFIX}{worker}").exists()
+                Review.objects.create(name=f"{STRESS_NAME_PREFIX}{worker}", content=f"Stress review {i}")
+        except OperationalError:
+            errors += 1
+        else:
+            ok += 1
+    connections.close_all()
+    return ok, errors
+
+
+class Command(BaseCommand):
+    help = "Hammer the SQLite database with concurrent review writes from forked worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=100, help="Reviews written per worker.")
+        parser.add_argument("--keep", action="store_true", help="Keep the reviews written by the test.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("This command needs a file-backed SQLite database.")
+
+        connections.close_all()
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(options["workers"]) as pool:
+            results = pool.starmap(write_reviews, [(w, options["writes"]) for w in range(options["workers"])])
+        elapsed = time.perf_counter() - start
+
+        ok = sum(r[0] for r in results)
+        errors = sum(r[1] for r in results)
+        self.stdout.write(
+            f"{ok} review(s) written, {errors} lock error(s) in {elapsed:.2f}s ({ok / elapsed:.0f} writes/s)"
+        )
+        if not options["keep"]:
+            Review.objects.filter(name__startswith=STRESS_NAME_PREFIX).delete()
+        if errors:
+            raise CommandError(f"{errors} write(s) failed with lock errors")
@@ -0,0 +1,249 @@
+import json
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from config import routers
+
+logger = logging.getLogger("main.performance")
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+# BEGIN/COMMIT/savepoints: timed but not counted as queries, so a count means
+# the same with or without TestCase's wrapping transaction (and the benchmark
+# and Server-Timing agree; COMMIT never reaches an execute wrapper anyway).
+_TRANSACTION_CONTROL = re.compile(r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+def is_transaction_control(sql):
+    return bool(_TRANSACTION_CONTROL.match(sql))
+
+
+class RequestMetrics:
+    """Counters collected while a single request is being handled."""
+    __slots__ = ("queries", "sql_time", "template_time", "captured_sql")
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.captured_sql = [] if capture_sql else None
+
+
+def _time_query(execute, sql, params, many, context):
+    """Execute wrapper that counts and times queries for the current request."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        if not is_transaction_control(sql):
+            metrics.queries += 1
+        metrics.sql_time += elapsed
+        if metrics.captured_sql is not None:
+            metrics.captured_sql.append((elapsed, sql))
+
+
+def _install_query_timer(sender=None, connection=None, **kwargs):
+    # Installed on every connection rather than per request: under ASGI the
+    # ORM runs in sync_to_async threads with their own connection objects,
+    # which a request-scoped execute_wrapper() would never see. The request
+    # metrics reach those threads through the _current_metrics context var.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _instrument_queries():
+    connection_created.connect(_install_query_timer, dispatch_uid="main.performance.query_timer")
+    for conn in connections.all(initialized_only=True):
+        _install_query_timer(connection=conn)
+
+
+def _instrument_template_rendering():
+    """
+    Wrap the Django template backend's render() once per process so that
+    render time is added to the metrics of the request being served.
+    """
+    original = DjangoTemplate.render
+    if getattr(original, "_timed", False):
+        return
+
+    def render(self, context=None, request=None):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+    render._timed = True
+    DjangoTemplate.render = render
+
+
+class PerformanceMiddleware:
+    """
+    Records SQL count/time, template render time and total time per request.
+
+    The numbers go out as a Server-Timing header (visible in the browser's
+    network panel) and as one JSON line on the "main.performance" logger.
+    When PERF_SLOW_SQL_SAMPLE_RATE > 0, that fraction of requests also keep
+    their SQL, and any of them slower than PERF_SLOW_REQUEST_MS is logged
+    with its slowest statements.
+
+    Works under both WSGI and ASGI without adapting the stack to sync.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        _instrument_queries()
+        _instrument_template_rendering()
+
+    def _begin(self):
+        sample_rate = settings.PERF_SLOW_SQL_SAMPLE_RATE
+        metrics = RequestMetrics(capture_sql=sample_rate > 0 and random.random() < sample_rate)
+        return metrics, _current_metrics.set(metrics), time.perf_counter()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token, start = self._begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    def _finish(self, request, response, metrics, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        sql_ms = metrics.sql_time * 1000
+        template_ms = metrics.template_time * 1000
+
+        if settings.PERF_SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={sql_ms:.1f};desc="{metrics.queries} queries", '
+                f'tpl;dur={template_ms:.1f};desc="templates", '
+                f'total;dur={total_ms:.1f};desc="view"'
+            )
+
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "db_queries": metrics.queries,
+            "db_ms": round(sql_ms, 2),
+            "template_ms": round(template_ms, 2),
+        }))
+
+        if metrics.captured_sql is not None and total_ms >= settings.PERF_SLOW_REQUEST_MS:
+            slowest = sorted(metrics.captured_sql, reverse=True)[:10]
+            logger.warning(json.dumps({
+                "slow_request": request.path,
+                "total_ms": round(total_ms, 2),
+                "sql": [{"ms": round(elapsed * 1000, 2), "sql": sql[:500]} for elapsed, sql in slowest],
+            }))
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for the primary/replica router.
+
+    A request that writes (or arrives with the pin cookie) reads from the
+    primary; after a write the client gets a cookie that keeps it on the
+    primary for REPLICA_PIN_SECONDS, covering e.g. submit_review followed by
+    load_more_reviews.
+    """
+    cookie_name = "db_pin"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = routers.begin_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self._pin(response, wrote)
+
+    async def __acall__(self, request):
+        token = routers.begin_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self._pin(response, wrote)
+
+    def _pin(self, response, wrote):
+        if wrote:
+            response.set_cookie(
+                self.cookie_name, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware stack.
+
+    Stock WhiteNoiseMiddleware is sync-only, which makes Django run every
+    request below it in a worker thread under ASGI. This keeps non-static
+    requests on the event loop and only serves files from a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_alter_review_options_alter_tour_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Review', 'verbose_name_plural': 'Reviews'},
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='review_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FTS_TABLE = "main_tour_fts"
+
+PG_VECTOR = """
+    setweight(to_tsvector('english', coalesce(%s, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'C')
+"""
+
+
+def _document(tour):
+    detailed_info = html.unescape(strip_tags(tour.detailed_info or ""))
+    return [tour.name, tour.location, tour.description, detailed_info]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "name, location, description, detailed_info, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE main_tour ADD COLUMN search_vector tsvector")
+        schema_editor.execute("CREATE INDEX main_tour_search_idx ON main_tour USING gin (search_vector)")
+    else:
+        return
+
+    # Index the tours that already exist.
+    Tour = apps.get_model("main", "Tour")
+    with schema_editor.connection.cursor() as cursor:
+        for tour in Tour.objects.iterator():
+            if vendor == "sqlite":
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, name, location, description, detailed_info) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    [tour.pk, *_document(tour)],
+                )
+            else:
+                cursor.execute(
+                    f"UPDATE main_tour SET search_vector = {PG_VECTOR} WHERE id = %s",
+                    [*_document(tour), tour.pk],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS main_tour_search_idx")
+        schema_editor.execute("ALTER TABLE main_tour DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_tour_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tourimage',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+def seed_review_counter(apps, schema_editor):
+    Counter = apps.get_model('main', 'Counter')
+    Review = apps.get_model('main', 'Review')
+    Counter.objects.create(name='reviews', value=Review.objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_tour_image_renditions_tourimage_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Counter',
+                'verbose_name_plural': 'Counters',
+            },
+        ),
+        migrations.RunPython(seed_review_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:55
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_rating_rows(apps, schema_editor):
+    Tour = apps.get_model('main', 'Tour')
+    TourRating = apps.get_model('main', 'TourRating')
+    TourRating.objects.bulk_create([TourRating(tour_id=pk) for pk in Tour.objects.values_list('pk', flat=True)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourRating',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='main.tour')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Tour Rating',
+                'verbose_name_plural': 'Tour Ratings',
+            },
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(5, '★★★★★'), (4, '★★★★'), (3, '★★★'), (2, '★★'), (1, '★')], null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='tour',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='main.tour'),
+        ),
+        migrations.RunPython(create_rating_rows, migrations.RunPython.noop),
+    ]
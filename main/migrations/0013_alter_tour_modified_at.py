@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_tourrating_review_rating_review_tour'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tour',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:20
+
+import re
+
+from django.db import migrations, models
+
+DURATION_PART = re.compile(r"(\d+)\s*(day|night|week)", re.IGNORECASE)
+
+
+def _duration_days(text):
+    # Frozen copy of main.models.parse_duration_days.
+    if not text:
+        return None
+    parts = {}
+    for number, unit in DURATION_PART.findall(text):
+        parts.setdefault(unit.lower(), int(number))
+    if "day" in parts:
+        return parts["day"]
+    if "week" in parts:
+        return parts["week"] * 7
+    if "night" in parts:
+        return parts["night"] + 1
+    number = re.search(r"\d+", text)
+    if number:
+        return int(number.group())
+    return 1 if re.search(r"\bday\b", text, re.IGNORECASE) else None
+
+
+def fill_duration_days(apps, schema_editor):
+    Tour = apps.get_model('main', 'Tour')
+    tours = list(Tour.objects.exclude(duration=None).exclude(duration='').only('pk', 'duration'))
+    for tour in tours:
+        tour.duration_days = _duration_days(tour.duration)
+    Tour.objects.bulk_update(tours, ['duration_days'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_alter_tour_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='duration_days',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_duration_days, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tour',
+            name='location',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='tour',
+            name='price',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+FTS_TABLE = "main_review_fts"
+PG_DOCUMENT = "to_tsvector('english', coalesce(name, '') || ' ' || content)"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "name, content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, content) SELECT id, name, content FROM main_review"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(f"CREATE INDEX main_review_search_idx ON main_review USING gin (({PG_DOCUMENT}))")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS main_review_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_tour_duration_days_alter_tour_location_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_review_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['rating', '-created_at', '-id'], name='review_rating_feed_idx'),
+        ),
+    ]
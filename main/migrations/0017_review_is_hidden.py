@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_review_review_rating_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='is_hidden',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_review_is_hidden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourrating',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
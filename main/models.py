@@ -1,22 +1,95 @@
-from django.db import models
+import re
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
 from ckeditor.fields import RichTextField
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils import timezone
+
+
+_DURATION_PART = re.compile(r"(\d+)\s*(day|night|week)", re.IGNORECASE)
+
+
+def parse_duration_days(text):
+    """
+    Day count from a free-text duration: "5 Days 4 Nights" -> 5,
+    "3 nights" -> 4, "2 weeks" -> 14, "7" -> 7, "Day trip" -> 1.
+    None when there is nothing to go on.
+    """
+    if not text:
+        return None
+    parts = {}
+    for number, unit in _DURATION_PART.findall(text):
+        parts.setdefault(unit.lower(), int(number))
+    if "day" in parts:
+        return parts["day"]
+    if "week" in parts:
+        return parts["week"] * 7
+    if "night" in parts:
+        return parts["night"] + 1
+    number = re.search(r"\d+", text)
+    if number:
+        return int(number.group())
+    return 1 if re.search(r"\bday\b", text, re.IGNORECASE) else None
 
 
 class Review(models.Model):
+    RATING_CHOICES = [(n, "★" * n) for n in range(5, 0, -1)]
+
     name = models.CharField(max_length=100, blank=True, null=True)
     content = models.TextField(max_length=300)
+    tour = models.ForeignKey(
+        "Tour", on_delete=models.SET_NULL, blank=True, null=True, related_name="reviews"
+    )
+    rating = models.PositiveSmallIntegerField(
+        choices=RATING_CHOICES, blank=True, null=True,
+        validators=[MinValueValidator(1), MaxValueValidator(5)],
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Hidden reviews stay in the admin but are left out of the public pages,
+    # the review counter and the tour ratings (see main/moderation.py).
+    is_hidden = models.BooleanField(default=False)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
+        indexes = [
+            # Backs the keyset-paginated review feed (see main/pagination.py)
+            models.Index(fields=['-created_at', '-id'], name='review_feed_idx'),
+            # Admin changelist filtered by rating: count and newest-first page
+            models.Index(fields=['rating', '-created_at', '-id'], name='review_rating_feed_idx'),
+        ]
 
     def display_name(self):
         return self.name if self.name else "Anonymous"
 
+    def stars(self):
+        return "★" * self.rating + "☆" * (5 - self.rating) if self.rating else ""
+
+    def as_json(self):
+        """Shape used by the AJAX endpoints and the live review stream."""
+        return {
+            "id": self.id,
+            "name": self.display_name(),
+            "content": self.content,
+            "rating": self.rating,
+            "stars": self.stars(),
+            "created_at": timezone.localtime(self.created_at).strftime("%b %d, %Y"),
+        }
+
+    def save(self, *args, **kwargs):
+        # post_save handlers update the review counter and tour rating;
+        # run them in the same transaction as the insert. No savepoint:
+        # when nested, a failure already aborts the enclosing block.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.display_name()} - {self.content[:30]}"
 
@@ -24,13 +97,16 @@ class Review(models.Model):
 class Tour(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, blank=True)  # ✅ added for SEO-friendly URLs
-    location = models.CharField(max_length=200)
+    location = models.CharField(max_length=200, db_index=True)
     description = models.TextField()
     detailed_info = RichTextField(blank=True, null=True)
     image = models.ImageField(upload_to="tours/", blank=True, null=True)
+    image_renditions = models.JSONField(default=list, blank=True, editable=False)  # see main/images.py
     duration = models.CharField(max_length=100, blank=True, null=True)
-    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # ✅ numeric
+    duration_days = models.PositiveSmallIntegerField(blank=True, null=True, editable=False, db_index=True)  # parsed from duration
+    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, db_index=True)  # ✅ numeric
     is_featured = models.BooleanField(default=False)
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)  # also bumped by gallery edits (signals); feed ?since=
 
     class Meta:
         ordering = ['-id']
@@ -44,6 +120,7 @@ class Tour(models.Model):
         # Auto-generate slug if missing
         if not self.slug:
             self.slug = slugify(self.name)
+        self.duration_days = parse_duration_days(self.duration)
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -53,6 +130,7 @@ class Tour(models.Model):
 class TourImage(models.Model):
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name="gallery")
     image = models.ImageField(upload_to="tours/gallery/")
+    image_renditions = models.JSONField(default=list, blank=True, editable=False)  # see main/images.py
     caption = models.CharField(max_length=150, blank=True)
 
     class Meta:
@@ -61,3 +139,93 @@ class TourImage(models.Model):
 
     def __str__(self):
         return f"{self.tour.name} - {self.caption or 'Extra Image'}"
+
+
+class TourRating(models.Model):
+    """
+    Per-tour rating aggregate (count, sum and a 5-bucket histogram),
+    maintained incrementally by main/ratings.py as reviews come and go.
+    """
+    tour = models.OneToOneField(Tour, on_delete=models.CASCADE, primary_key=True, related_name="rating")
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    # The rating's own version: cached cards and the detail page's validators
+    # key on it, so a new review doesn't touch Tour.modified_at or the catalogue version.
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Tour Rating"
+        verbose_name_plural = "Tour Ratings"
+
+    def __str__(self):
+        return f"{self.tour_id}: {self.average} ({self.count})"
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 1) if self.count else None
+
+    def histogram(self):
+        """[(stars, count, percent)] from 5 stars down to 1."""
+        return [
+            (n, getattr(self, f"stars_{n}"), round(100 * getattr(self, f"stars_{n}") / self.count) if self.count else 0)
+            for n in range(5, 0, -1)
+        ]
+
+
+class Counter(models.Model):
+    """
+    Named, materialized counters (e.g. the total number of reviews), kept up
+    to date by signals so pages never need COUNT(*). See main/counters.py.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Counter"
+        verbose_name_plural = "Counters"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Outgoing email waiting to be delivered by the `send_queued_mail` worker.
+    Views enqueue rows here (see main/mail.py) instead of talking to SMTP.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_DEAD, "Dead letter"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(help_text="List of recipient addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
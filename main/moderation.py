@@ -0,0 +1,70 @@
+"""
+Bulk review moderation: hide, restore or delete any number of reviews at once.
+
+Deleting reviews one by one runs every Review signal handler per row
+(counter, tour rating, search index, cache bump, live stream). Here the
+matching rows change in a single UPDATE or DELETE, and everything derived
+from them is adjusted once, in the same transaction:
+
+- the visible-review counter by one delta,
+- each affected tour's rating by one UPDATE (see ratings.apply_reviews),
+- the search index by one DELETE (hidden reviews stay searchable in the admin),
+- after commit, the cached review pages by one version bump and open live
+  streams by a single resync event.
+
+The signal handlers are bypassed on purpose; counters.reconcile() and
+ratings.rebuild_ratings() repair any drift.
+"""
+from django.db import connection, transaction
+
+from . import counters, ratings, search
+from .cache import bump_reviews_version
+from .events import broadcaster
+from .models import Review
+
+HIDE, RESTORE, DELETE = "hide", "restore", "delete"
+ACTIONS = (HIDE, RESTORE, DELETE)
+
+
+def _after_commit():
+    bump_reviews_version()
+    broadcaster.publish("resync", {})
+
+
+def _delete(reviews):
+    # QuerySet.delete() would load every row to send post_delete; the
+    # matching ids are used as a subquery instead.
+    sql, params = reviews.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        table, pk = Review._meta.db_table, Review._meta.pk.column
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def moderate(queryset, action):
+    """Apply `action` to every review in `queryset`; returns how many reviews changed."""
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown moderation action {action!r}")
+    reviews = queryset.order_by()
+    visible = reviews.filter(is_hidden=False)
+
+    with transaction.atomic():
+        if action == RESTORE:
+            hidden = reviews.filter(is_hidden=True)
+            ratings.apply_reviews(hidden, +1)
+            changed = shown = hidden.update(is_hidden=False)
+        elif action == HIDE:
+            ratings.apply_reviews(visible, -1)
+            changed = visible.update(is_hidden=True)
+            shown = -changed
+        else:
+            shown = -visible.count()
+            ratings.apply_reviews(visible, -1)
+            search.remove_reviews(reviews)
+            changed = _delete(reviews)
+
+        if shown:
+            counters.adjust(counters.REVIEWS, shown)
+        if changed:
+            transaction.on_commit(_after_commit)
+    return changed
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a feed cursor cannot be decoded."""
+
+
+def encode_cursor(created_at, pk):
+    """
+    Build an opaque cursor pointing just after the given (created_at, id) pair.
+    """
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Return the (created_at, id) pair stored in a cursor made by encode_cursor().
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def keyset_page(queryset, cursor=None, page_size=10):
+    """
+    Slice a queryset ordered by ('-created_at', '-id') using keyset pagination.
+
+    Instead of an OFFSET, each page starts strictly after the row the cursor
+    points at, so every page is a single indexed range scan no matter how deep
+    the reader has scrolled. Returns (items, next_cursor); next_cursor is None
+    on the last page.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(created_at__lte=created_at).exclude(
+            created_at=created_at, id__gte=pk
+        )
+
+    # Fetch one extra row to know whether another page exists.
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+def estimated_count(queryset):
+    """
+    Row count of the queryset's table from the planner statistics
+    (pg_class.reltuples, or sqlite_stat1 once ANALYZE has run), or None
+    when there are none. Cheap, but only as fresh as the last ANALYZE.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            except DatabaseError:  # no sqlite_stat1 table until the first ANALYZE
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None  # Postgres reports -1 before the first ANALYZE
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over big tables: an unfiltered listing
+    uses estimated_count() instead of a full COUNT(*). Filtered listings and
+    small tables are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN:
+                return estimate
+        return super().count
@@ -0,0 +1,99 @@
+"""
+Incremental maintenance of TourRating.
+
+Every review insert, edit or delete turns into a single UPDATE of the
+tour's aggregate row, run by signal handlers inside the review's own
+transaction (Review.save/delete are atomic), so listing pages can show
+"4.7 ★ (312 reviews)" without aggregating reviews. Each update stamps the
+row's modified_at, which the cached cards and the tour page key on; the
+tour itself and the catalogue version are left alone, so the feed, facets
+and other tours' cards stay cached.
+
+Hidden reviews contribute nothing; main.moderation hides, restores and
+deletes reviews in bulk through apply_reviews().
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .cache import bump_ratings_version
+from .models import Review, Tour, TourRating
+
+
+def _contribution(tour_id, rating, is_hidden=False):
+    return (tour_id, rating) if tour_id and rating and not is_hidden else None
+
+
+def _shift(tour_id, stars):
+    """Add stars[rating] reviews (negative to remove) to one tour's aggregate row."""
+    changes = {
+        "count": F("count") + sum(stars.values()),
+        "total": F("total") + sum(rating * n for rating, n in stars.items()),
+        "modified_at": timezone.now(),  # update() skips auto_now
+    }
+    for rating, n in stars.items():
+        changes[f"stars_{rating}"] = F(f"stars_{rating}") + n
+    if not TourRating.objects.filter(tour_id=tour_id).update(**changes):
+        TourRating.objects.get_or_create(tour_id=tour_id)
+        TourRating.objects.filter(tour_id=tour_id).update(**changes)
+
+
+def _apply(contribution, sign):
+    if contribution is None:
+        return
+    tour_id, rating = contribution
+    _shift(tour_id, {rating: sign})
+    transaction.on_commit(bump_ratings_version)
+
+
+def review_saved(review, stored):
+    """`stored` is the row's tour_id, rating and is_hidden before the save (None when new)."""
+    previous = _contribution(**stored) if stored else None
+    current = _contribution(review.tour_id, review.rating, review.is_hidden)
+    if current != previous:
+        _apply(previous, -1)
+        _apply(current, +1)
+
+
+def review_deleted(review):
+    _apply(_contribution(review.tour_id, review.rating, review.is_hidden), -1)
+
+
+def apply_reviews(reviews, sign):
+    """
+    Add (sign=+1) or remove (-1) the contribution of every review in the
+    queryset at once: one GROUP BY, then one UPDATE per affected tour.
+    Callers pass only reviews that currently count (or are about to).
+    """
+    rows = (
+        reviews.filter(tour__isnull=False, rating__isnull=False)
+        .order_by().values_list("tour", "rating").annotate(n=Count("id"))
+    )
+    per_tour = defaultdict(Counter)
+    for tour_id, rating, n in rows:
+        per_tour[tour_id][rating] += sign * n
+    for tour_id, stars in per_tour.items():
+        _shift(tour_id, stars)
+    if per_tour:
+        transaction.on_commit(bump_ratings_version)
+
+
+def rebuild_ratings():
+    """Recompute every TourRating from the reviews (after bulk loads or drift)."""
+    buckets = {f"stars_{n}": Count("id", filter=Q(rating=n)) for n in range(1, 6)}
+    stats = (
+        Review.objects.filter(tour__isnull=False, rating__isnull=False, is_hidden=False)
+        .order_by().values("tour").annotate(count=Count("id"), total=Sum("rating"), **buckets)
+    )
+    with transaction.atomic():
+        TourRating.objects.all().delete()
+        rated = {row.pop("tour"): row for row in stats}
+        TourRating.objects.bulk_create(
+            [TourRating(tour_id=tour_id, **rated.get(tour_id, {}))
+             for tour_id in Tour.objects.values_list("pk", flat=True).iterator()],
+            batch_size=1000,
+        )
+    transaction.on_commit(bump_ratings_version)
+    return len(rated)
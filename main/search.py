@@ -0,0 +1,235 @@
+"""
+Full-text search for main.Tour, and for main.Review in the admin.
+
+SQLite uses an FTS5 virtual table (main_tour_fts) keyed by the tour id;
+Postgres uses a weighted `search_vector` tsvector column on main_tour with a
+GIN index. Both are created by migration 0008 and kept in sync by the Tour
+post_save/post_delete signals. Other databases fall back to icontains.
+
+Reviews work the same way on SQLite (main_review_fts, migration 0015, kept
+in sync by the Review signals). On Postgres they need no extra column: a GIN
+expression index on the review text is maintained by the database itself.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Q, When
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from .models import Review, Tour
+
+FTS_TABLE = "main_tour_fts"
+REVIEW_FTS_TABLE = "main_review_fts"
+
+# Must match the expression in migration 0015's GIN index, or it isn't used.
+PG_REVIEW_DOCUMENT = "to_tsvector('english', coalesce(name, '') || ' ' || content)"
+
+# Snippet highlight markers. Control characters never appear in tour text, so
+# the snippet can be HTML-escaped first and the markers swapped for <mark> after.
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_SQLITE_SEARCH = f"""
+    SELECT rowid, snippet({FTS_TABLE}, -1, '{_MARK_START}', '{_MARK_END}', '…', 16)
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY bm25({FTS_TABLE}, 10.0, 6.0, 2.0, 1.0)
+    LIMIT %s
+"""
+
+_PG_VECTOR = """
+    setweight(to_tsvector('english', coalesce(%s, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(%s, '')), 'C')
+"""
+
+_PG_SEARCH = f"""
+    SELECT id, ts_headline('english', description, q,
+                           'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=30, MinWords=12')
+    FROM main_tour, to_tsquery('english', %s) AS q
+    WHERE search_vector @@ q
+    ORDER BY ts_rank(search_vector, q) DESC
+    LIMIT %s
+"""
+
+
+def _vendor():
+    return connection.vendor if connection.vendor in ("sqlite", "postgresql") else None
+
+
+def _terms(query):
+    """Split a user query into plain word tokens (no FTS operators)."""
+    return re.findall(r"\w+", query.lower())
+
+
+def _plain_text(value):
+    return html.unescape(strip_tags(value or ""))
+
+
+def _document(tour):
+    return [tour.name, tour.location, tour.description, _plain_text(tour.detailed_info)]
+
+
+def index_tour(tour):
+    """Insert or refresh a tour's entry in the search index."""
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [tour.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, location, description, detailed_info) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [tour.pk, *_document(tour)],
+            )
+        elif vendor == "postgresql":
+            cursor.execute(
+                f"UPDATE main_tour SET search_vector = {_PG_VECTOR} WHERE id = %s",
+                [*_document(tour), tour.pk],
+            )
+
+
+def remove_tour(tour_id):
+    """Drop a deleted tour from the index (Postgres rows go with the tour)."""
+    if _vendor() == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [tour_id])
+
+
+def rebuild_index():
+    """Re-index every tour, e.g. after a bulk import that bypassed signals."""
+    if _vendor() == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    count = 0
+    for tour in Tour.objects.order_by().iterator(chunk_size=500):
+        index_tour(tour)
+        count += 1
+    return count
+
+
+def _highlight(snippet):
+    snippet = escape(snippet or "")
+    return mark_safe(snippet.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>"))
+
+
+def _ranked_hits(terms, limit):
+    vendor = _vendor()
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            # Quoted tokens with a trailing * are prefix matches; spaces mean AND.
+            cursor.execute(_SQLITE_SEARCH, [" ".join(f'"{t}"*' for t in terms), limit])
+        else:
+            cursor.execute(_PG_SEARCH, [" & ".join(f"{t}:*" for t in terms), limit])
+        return cursor.fetchall()
+
+
+def search_tours(query, queryset=None, limit=None):
+    """
+    Rank tours against a free-text query with prefix matching.
+
+    Returns (queryset, snippets): the queryset is restricted to the hits and
+    ordered best match first; snippets maps tour id -> highlighted excerpt
+    (safe HTML with <mark> around matches).
+    """
+    queryset = Tour.objects.all() if queryset is None else queryset
+    terms = _terms(query)
+    if not terms:
+        return queryset.none(), {}
+
+    if _vendor() is None:
+        condition = Q()
+        for term in terms:
+            condition &= (Q(name__icontains=term) | Q(location__icontains=term)
+                          | Q(description__icontains=term))
+        return queryset.filter(condition), {}
+
+    hits = _ranked_hits(terms, limit or settings.TOUR_SEARCH_LIMIT)
+    if not hits:
+        return queryset.none(), {}
+    ranking = Case(*[When(pk=pk, then=position) for position, (pk, _) in enumerate(hits)])
+    snippets = {pk: _highlight(snippet) for pk, snippet in hits}
+    return queryset.filter(pk__in=snippets).order_by(ranking), snippets
+
+
+# --- Reviews (admin search) ---
+def index_review(review, created=False):
+    """Insert or refresh a review's entry in the SQLite index (Postgres needs nothing)."""
+    if _vendor() != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        if not created:
+            cursor.execute(f"DELETE FROM {REVIEW_FTS_TABLE} WHERE rowid = %s", [review.pk])
+        cursor.execute(
+            f"INSERT INTO {REVIEW_FTS_TABLE} (rowid, name, content) VALUES (%s, %s, %s)",
+            [review.pk, review.name, review.content],
+        )
+
+
+def remove_review(review_id):
+    if _vendor() == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {REVIEW_FTS_TABLE} WHERE rowid = %s", [review_id])
+
+
+def remove_reviews(queryset):
+    """Drop every review in `queryset` from the index in one statement (before a bulk delete)."""
+    if _vendor() == "sqlite":
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {REVIEW_FTS_TABLE} WHERE rowid IN ({sql})", params)
+
+
+def rebuild_review_index():
+    """
+    Re-index every review in one statement, e.g. after a bulk import. Returns
+    the number indexed, or None where the database maintains the index itself.
+    """
+    if _vendor() != "sqlite":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {REVIEW_FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {REVIEW_FTS_TABLE} (rowid, name, content) SELECT id, name, content FROM main_review"
+        )
+        return cursor.rowcount
+
+
+def search_reviews(query, queryset=None, limit=None):
+    """
+    The newest `limit` reviews whose name or text contain every word of
+    `query` as a prefix. The index is queried once for the capped id list,
+    so the admin's page and count queries that follow are cheap pk lookups;
+    without the cap, counting and sorting half a million hits for a common
+    word is slow.
+    """
+    queryset = Review.objects.all() if queryset is None else queryset
+    limit = limit or settings.ADMIN_REVIEW_SEARCH_LIMIT
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = _vendor()
+    if vendor is None:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(content__icontains=term)
+        return queryset.filter(condition)
+
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"SELECT rowid FROM {REVIEW_FTS_TABLE} WHERE {REVIEW_FTS_TABLE} MATCH %s "
+                "ORDER BY rowid DESC LIMIT %s",
+                [" ".join(f'"{t}"*' for t in terms), limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT id FROM main_review WHERE {PG_REVIEW_DOCUMENT} @@ to_tsquery('english', %s) "
+                "ORDER BY id DESC LIMIT %s",
+                [" & ".join(f"{t}:*" for t in terms), limit],
+            )
+        ids = [pk for pk, in cursor.fetchall()]
+    return queryset.filter(pk__in=ids)
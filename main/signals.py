@@ -1,8 +1,19 @@
-from django.db.models.signals import pre_save, post_save
+import logging
+from functools import partial
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
-from django.core.mail import send_mail
-from .models import Tour, Review
+from .models import Tour, TourImage, TourRating, Review
+from .cache import bump_catalogue_version, bump_reviews_version
+from .mail import enqueue_mail
+from . import counters, events, images, ratings, search, sitemap
+
+logger = logging.getLogger(__name__)
 
 
 # --- Auto-generate slug for Tours ---
@@ -12,6 +23,157 @@ def generate_tour_slug(sender, instance, **kwargs):
         instance.slug = slugify(instance.name)
 
 
+# --- Keep the tour and review search indexes in sync ---
+@receiver(post_save, sender=Tour)
+def index_tour_for_search(sender, instance, **kwargs):
+    search.index_tour(instance)
+
+
+@receiver(post_delete, sender=Tour)
+def remove_tour_from_search(sender, instance, **kwargs):
+    search.remove_tour(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+def index_review_for_search(sender, instance, created, **kwargs):
+    search.index_review(instance, created=created)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_search(sender, instance, **kwargs):
+    search.remove_review(instance.pk)
+
+
+# --- Build responsive renditions after an image upload ---
+@receiver(post_save, sender=Tour)
+@receiver(post_save, sender=TourImage)
+def generate_image_renditions(sender, instance, **kwargs):
+    if not settings.IMAGE_RENDITIONS_ON_UPLOAD or images.renditions_current(instance):
+        return
+
+    def build():
+        try:
+            images.refresh_renditions(instance)
+        except Exception:
+            logger.exception("Could not build renditions for %s", instance)
+
+    transaction.on_commit(build)
+
+
+# --- Gallery edits change the tour page, so bump its modified_at ---
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+def touch_tour_on_gallery_change(sender, instance, **kwargs):
+    Tour.objects.filter(pk=instance.tour_id).update(modified_at=timezone.now())
+
+
+# --- Keep the pre-rendered sitemap current (main/sitemap.py) ---
+# Tours changed per connection (so per thread) and not yet rebuilt.
+_sitemap_pending = WeakKeyDictionary()
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+def update_sitemap(sender, instance, **kwargs):
+    connection = transaction.get_connection()
+    _sitemap_pending.setdefault(connection, set()).add(instance.pk if sender is Tour else instance.tour_id)
+    # Every save registers a flush, but the first one to run after the commit
+    # takes all the ids, so each shard is rebuilt once per transaction. Ids
+    # left by a rolled-back transaction are rebuilt (harmlessly) with the next.
+    transaction.on_commit(partial(_flush_sitemap, connection))
+
+
+def _flush_sitemap(connection):
+    tour_ids = _sitemap_pending.pop(connection, None)
+    if not tour_ids:
+        return
+    try:
+        sitemap.tours_changed(tour_ids)
+    except Exception:
+        logger.exception("Could not update the sitemap for tours %s", sorted(tour_ids))
+
+
+# --- Invalidate cached catalogue fragments ---
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+def invalidate_catalogue_cache(sender, **kwargs):
+    # After commit, so a concurrent reader can't cache the old rows under the new version.
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_pages(sender, **kwargs):
+    transaction.on_commit(bump_reviews_version)
+
+
+# --- Remember the stored review row before an edit ---
+@receiver(pre_save, sender=Review)
+def snapshot_review(sender, instance, **kwargs):
+    # Read by the counter, stream and rating handlers below.
+    instance._stored = None
+    if instance.pk is not None:
+        instance._stored = Review.objects.filter(pk=instance.pk).values("tour_id", "rating", "is_hidden").first()
+
+
+def _was_visible(review):
+    stored = getattr(review, "_stored", None)
+    return stored is not None and not stored["is_hidden"]
+
+
+# --- Keep the materialized review count current ---
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, **kwargs):
+    delta = (not instance.is_hidden) - _was_visible(instance)
+    if delta:
+        counters.adjust(counters.REVIEWS, delta)
+
+
+@receiver(post_delete, sender=Review)
+def count_deleted_review(sender, instance, **kwargs):
+    if not instance.is_hidden:
+        counters.adjust(counters.REVIEWS, -1)
+
+
+# --- Live review stream (main/events.py) ---
+@receiver(post_save, sender=Review)
+def stream_saved_review(sender, instance, **kwargs):
+    was_visible, visible = _was_visible(instance), not instance.is_hidden
+    if visible and not was_visible:  # new, or un-hidden
+        payload = instance.as_json()
+        transaction.on_commit(lambda: events.broadcaster.publish("review-created", payload))
+    elif was_visible and not visible:
+        payload = {"id": instance.pk}
+        transaction.on_commit(lambda: events.broadcaster.publish("review-deleted", payload))
+
+
+@receiver(post_delete, sender=Review)
+def stream_deleted_review(sender, instance, **kwargs):
+    payload = {"id": instance.pk}
+    transaction.on_commit(lambda: events.broadcaster.publish("review-deleted", payload))
+
+
+# --- Per-tour rating aggregates ---
+@receiver(post_save, sender=Tour)
+def create_tour_rating(sender, instance, created, **kwargs):
+    if created:
+        TourRating.objects.get_or_create(tour=instance)
+
+
+@receiver(post_save, sender=Review)
+def update_tour_rating(sender, instance, **kwargs):
+    ratings.review_saved(instance, getattr(instance, "_stored", None))
+
+
+@receiver(post_delete, sender=Review)
+def remove_tour_rating(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
 # --- Notify admin when a new Review is added ---
 @receiver(post_save, sender=Review)
 def notify_new_review(sender, instance, created, **kwargs):
@@ -24,10 +186,9 @@ def notify_new_review(sender, instance, created, **kwargs):
         Content: {instance.content}
         Date: {instance.created_at.strftime('%b %d, %Y')}
         """
-        send_mail(
+        enqueue_mail(
             subject,
             message,
             "no-reply@mbtravels.com",
             ["info@mbtravels.com"],  # your admin inbox
-            fail_silently=True,
         )
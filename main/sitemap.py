@@ -0,0 +1,171 @@
+"""
+Pre-rendered sitemaps for search engines, kept in default storage.
+
+    sitemaps/sitemap.xml          index, served as /sitemap.xml
+    sitemaps/pages.xml.gz         home, tours, about, contact
+    sitemaps/tours-<n>.xml.gz     tour pages with ids in shard n
+
+Tours are sharded by id (SITEMAP_SHARD_SIZE ids per file, well under the
+protocol's 50,000 URLs / 50 MB), so a tour always lives in the same file.
+Saving or deleting tours rebuilds only their shards, the small pages file
+and the index (see the signals), once per transaction after it commits. Each URL and
+each shard in the index carries a lastmod from Tour.modified_at, so
+crawlers re-fetch only the shards and pages that changed.
+
+Incremental updates start once a full build exists: the first request for
+/sitemap.xml or `manage.py build_sitemaps` creates it.
+"""
+import gzip
+import os
+import tempfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Max
+from django.urls import reverse
+
+from .models import Tour
+
+DIRECTORY = "sitemaps"
+INDEX = f"{DIRECTORY}/sitemap.xml"
+PAGES = "pages"
+STATIC_PAGES = ["home", "tours", "about", "contact"]
+
+_URLSET = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+_SITEMAPINDEX = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip("/") + path
+
+
+def shard_of(tour_id):
+    return (tour_id - 1) // settings.SITEMAP_SHARD_SIZE
+
+
+def shard_path(name):
+    return f"{DIRECTORY}/{name}.xml.gz"
+
+
+def _lastmod(stamp):
+    return f"<lastmod>{stamp.isoformat(timespec='seconds')}</lastmod>" if stamp else ""
+
+
+def _entry(tag, loc, stamp=None):
+    return f"<{tag}><loc>{escape(loc)}</loc>{_lastmod(stamp)}</{tag}>\n"
+
+
+def _save(name, content):
+    """Replace `name` in storage; a reader gets the old file or the new one, never a gap."""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        # No local path: overwrite by name; storage.save() would pick a new name instead.
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(content))
+        return
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Dot-prefixed, so build_all() never mistakes a half-written file for a shard.
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(content)
+        if default_storage.file_permissions_mode is not None:
+            os.chmod(temp, default_storage.file_permissions_mode)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def _save_gzipped(name, lines):
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as out:
+        for line in lines:
+            out.write(line.encode())
+    _save(shard_path(name), buffer.getvalue())
+
+
+def _shards():
+    """{shard number: newest modified_at} for every shard that has tours."""
+    rows = (
+        Tour.objects.order_by().annotate(shard=(F("pk") - 1) / settings.SITEMAP_SHARD_SIZE)
+        .values("shard").annotate(lastmod=Max("modified_at")).values_list("shard", "lastmod")
+    )
+    return dict(rows)
+
+
+def build_shard(shard):
+    """Render one tour shard; removes its file when the shard is empty. Returns the URL count."""
+    size = settings.SITEMAP_SHARD_SIZE
+    tours = (
+        Tour.objects.filter(pk__gt=shard * size, pk__lte=(shard + 1) * size)
+        .order_by("pk").values_list("slug", "modified_at")
+    )
+    rows = list(tours)
+    if not rows:
+        if default_storage.exists(shard_path(f"tours-{shard}")):
+            default_storage.delete(shard_path(f"tours-{shard}"))
+        return 0
+    lines = [_URLSET]
+    lines += [_entry("url", absolute(reverse("tour_detail", kwargs={"slug": slug})), stamp) for slug, stamp in rows]
+    lines.append("</urlset>\n")
+    _save_gzipped(f"tours-{shard}", lines)
+    return len(rows)
+
+
+def build_index():
+    """Render the pages file and the index from the current shard list (one GROUP BY)."""
+    shards = _shards()
+    newest = max(shards.values(), default=None)
+    pages = [_URLSET]
+    for name in STATIC_PAGES:
+        # The home and tours pages list tours; about and contact carry no stamp.
+        pages.append(_entry("url", absolute(reverse(name)), newest if name in ("home", "tours") else None))
+    pages.append("</urlset>\n")
+    _save_gzipped(PAGES, pages)
+
+    index = [_SITEMAPINDEX, _entry("sitemap", absolute(reverse("sitemap_shard", args=[PAGES])), newest)]
+    for shard, stamp in sorted(shards.items()):
+        index.append(_entry("sitemap", absolute(reverse("sitemap_shard", args=[f"tours-{shard}"])), stamp))
+    index.append("</sitemapindex>\n")
+    _save(INDEX, "".join(index).encode())
+    return shards
+
+
+def build_all():
+    """Full rebuild: every shard, then the index. Returns (shards, URLs) written."""
+    stale = {
+        name for name in default_storage.listdir(DIRECTORY)[1] if name.startswith("tours-")
+    } if default_storage.exists(DIRECTORY) else set()
+    urls = 0
+    shards = _shards()
+    for shard in shards:
+        urls += build_shard(shard)
+        stale.discard(f"tours-{shard}.xml.gz")
+    for name in stale:  # shards whose tours were all deleted
+        default_storage.delete(f"{DIRECTORY}/{name}")
+    build_index()
+    return len(shards), urls
+
+
+def tours_changed(tour_ids):
+    """Bring the sitemap up to date after the given tours were saved or deleted."""
+    if not default_storage.exists(INDEX):
+        return
+    for shard in sorted({shard_of(tour_id) for tour_id in tour_ids}):
+        build_shard(shard)
+    build_index()
+
+
+def tours_loaded():
+    """Full rebuild after a bulk load (bulk_create sends no signals), once a sitemap exists."""
+    if default_storage.exists(INDEX):
+        build_all()
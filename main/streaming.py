@@ -0,0 +1,34 @@
+"""
+Streaming response bodies that stay streamed under ASGI.
+
+Given a *sync* iterator, Django's ASGI handler runs sync_to_async(list) on
+it, so the whole body is built in memory before the first byte is sent.
+Views that stream large bodies (the partner feed, sitemap files) hand ASGI
+an async iterator instead, which advances the sync one a batch at a time in
+the sync thread, where its database cursor or open file lives. WSGI keeps
+the plain iterator.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+async def aiter_batches(iterable, batch_size):
+    iterator = iter(iterable)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    try:
+        while batch := await next_batch():
+            for item in batch:
+                yield item
+    finally:
+        # Client gone or body done: release the generator's cursor in its own thread.
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_content(request, iterable, batch_size):
+    """`iterable` in the form a StreamingHttpResponse for this request should get."""
+    if isinstance(request, ASGIRequest):
+        return aiter_batches(iterable, batch_size)
+    return iterable
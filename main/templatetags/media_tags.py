@@ -0,0 +1,20 @@
+from django import template
+
+from main import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(obj, fmt="webp"):
+    """
+    Usage: <img srcset="{% srcset tour %}" ...>
+    Renders the responsive rendition list for obj.image in the given format.
+    """
+    return images.srcset(obj, fmt)
+
+
+@register.simple_tag
+def rendition_url(obj, width, fmt="webp"):
+    """Usage: <img src="{% rendition_url tour 640 %}"> (falls back to the original)."""
+    return images.rendition_url(obj, width, fmt)
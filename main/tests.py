@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site as admin_site
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from config.routers import PrimaryReplicaRouter
+
+from .benchmark import Scenario
+from .cache import catalogue_version, reviews_version
+from .counters import REVIEWS, get_count
+from .events import RESYNC, Broadcaster, TooManyStreams, broadcaster, stream
+from .facets import TourFacets, location_options
+from .feed import feed_lines
+from .images import srcset, thumbnail_url
+from .middleware import ReplicaPinningMiddleware, is_transaction_control
+from .moderation import DELETE, HIDE, RESTORE, moderate
+from .mail import send_queued_mail
+from .models import Counter, OutboundEmail, Review, Tour, TourImage, TourRating, parse_duration_days
+from .pagination import EstimatedCountPaginator, encode_cursor, decode_cursor
+from .ratings import rebuild_ratings
+from .search import rebuild_review_index, search_reviews, search_tours
+from . import sitemap
+from .throttle import _keys as throttle_keys, client_ip, in_flight
+
+
+AJAX = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+# Keep the per-request performance log out of the test output.
+logging.getLogger("main.performance").setLevel(logging.WARNING)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Email backend that refuses every message, used to test retries."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class ReviewFeedTests(TestCase):
+    def setUp(self):
+        # Reviews saved in the same test share near-identical timestamps,
+        # which exercises the id tie-breaker in the cursor.
+        self.reviews = [Review.objects.create(name=f"R{i}", content=f"Review {i}") for i in range(25)]
+
+    def test_cursor_round_trip(self):
+        review = self.reviews[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(review.created_at, review.id)),
+            (review.created_at, review.id),
+        )
+
+    def test_home_exposes_first_cursor(self):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(len(response.context["reviews"]), 3)
+        self.assertIsNotNone(response.context["next_cursor"])
+
+    def test_following_cursor_walks_every_review_once(self):
+        with self.settings(REVIEWS_PAGE_SIZE=10):
+            cursor = self.client.get(reverse("home")).context["next_cursor"]
+            seen = []
+            while cursor:
+                data = self.client.get(reverse("load_more_reviews"), {"cursor": cursor}, **AJAX).json()
+                self.assertLessEqual(len(data["reviews"]), 10)
+                seen.extend(r["id"] for r in data["reviews"])
+                cursor = data["next"]
+
+        expected = list(Review.objects.order_by("-created_at", "-id").values_list("id", flat=True))[3:]
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("load_more_reviews"), {"cursor": "not-a-cursor"}, **AJAX)
+        self.assertEqual(response.status_code, 400)
+
+
+class OutboxTests(TestCase):
+    def post_contact(self):
+        return self.client.post(reverse("contact"), {
+            "name": "Jane", "email": "jane@example.com", "message": "Masai Mara in July?",
+        })
+
+    def test_contact_enqueues_instead_of_sending(self):
+        self.post_contact()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING).count(), 2)
+
+    def test_worker_delivers_queued_mail(self):
+        self.post_contact()
+        call_command("send_queued_mail", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[1].alternatives[0][1], "text/html")
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+
+    @override_settings(EMAIL_BACKEND="main.tests.FailingEmailBackend", EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_dead_letter(self):
+        Review.objects.create(content="Great trip")  # queues the admin notification
+        message = OutboundEmail.objects.get()
+
+        self.assertEqual(send_queued_mail(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboundEmail.STATUS_PENDING)
+        self.assertIn("SMTP unavailable", message.last_error)
+
+        # Not due again until the backoff has elapsed.
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=message.created_at)
+        send_queued_mail()
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboundEmail.STATUS_DEAD)
+        self.assertEqual(message.attempts, 2)
+
+
+class TourSearchTests(TestCase):
+    def setUp(self):
+        self.mara = Tour.objects.create(
+            name="Masai Mara Migration Safari", location="Kenya",
+            description="Watch the wildebeest cross the Mara river.",
+        )
+        self.gorilla = Tour.objects.create(
+            name="Gorilla Trek", location="Bwindi, Uganda",
+            description="Trek through the forest.",
+            detailed_info="<p>Permits include a <strong>wildebeest</strong>-free hike.</p>",
+        )
+
+    def test_ranks_name_matches_first_and_searches_rich_text(self):
+        results, snippets = search_tours("wildebeest")
+        self.assertEqual(list(results), [self.mara, self.gorilla])
+        self.assertIn("<mark>wildebeest</mark>", snippets[self.mara.id])
+
+    def test_prefix_matching(self):
+        results, _ = search_tours("gori")
+        self.assertEqual(list(results), [self.gorilla])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.gorilla.name = "Chimpanzee Trek"
+        self.gorilla.save()
+        self.assertFalse(search_tours("gorilla")[0].exists())
+        self.mara.delete()
+        self.assertFalse(search_tours("mara")[0].exists())
+
+    def test_tours_page_uses_search(self):
+        response = self.client.get(reverse("tours"), {"q": "kenya"})
+        self.assertEqual(list(response.context["tours"]), [self.mara])
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class TourFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.amboseli = Tour.objects.create(
+            name="Amboseli", location="Kenya", description="Elephants.", duration="3 Days 2 Nights", price=800
+        )
+        self.mara = Tour.objects.create(
+            name="Mara", location="Kenya", description="Lions.", duration="6 nights", price=3000
+        )
+        self.bwindi = Tour.objects.create(
+            name="Bwindi", location="Uganda", description="Gorillas.", duration="1 week", price=1200
+        )
+
+    def test_parse_duration_days(self):
+        cases = {"5 Days 4 Nights": 5, "3 nights": 4, "2 weeks": 14, "7": 7, "Day trip": 1, "Flexible": None, None: None}
+        for text, days in cases.items():
+            self.assertEqual(parse_duration_days(text), days, text)
+        self.assertEqual(self.mara.duration_days, 7)
+
+    def test_counts_apply_the_other_facets(self):
+        facets = TourFacets({"location": "Kenya", "duration": "4-7", "price": "bogus"})
+        self.assertEqual(list(facets.filter(Tour.objects.all())), [self.mara])
+        with self.assertNumQueries(1):
+            counts = {f["name"]: {o["value"]: o["count"] for o in f["options"]} for f in facets.counts(Tour.objects.all())}
+        self.assertEqual(counts["location"], {"Kenya": 1, "Uganda": 1})  # both 4-7 days
+        self.assertEqual(counts["duration"]["1-3"], 1)  # Kenya only
+        self.assertEqual(counts["price"]["2500-5000"], 1)  # price isn't selected: Kenya and 4-7 days
+
+    def test_duration_filter_uses_index(self):
+        plan = Tour.objects.filter(duration_days__gte=4, duration_days__lte=7).explain()
+        self.assertIn("duration_days", plan)
+        self.assertIn("INDEX", plan.upper())
+
+    def test_location_options_follow_catalogue_changes(self):
+        self.assertEqual(location_options(), ["Kenya", "Uganda"])
+        with self.assertNumQueries(0):
+            location_options()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tour.objects.create(name="Serengeti", location="Tanzania", description="Plains.")
+        self.assertEqual(location_options(), ["Kenya", "Tanzania", "Uganda"])
+
+    def test_tours_page_filters(self):
+        response = self.client.get(reverse("tours"), {"price": "under-1000"})
+        self.assertEqual(list(response.context["tours"]), [self.amboseli])
+        self.assertContains(response, '<option value="Kenya">Kenya (1)</option>', html=True)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class TourFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tour = Tour.objects.create(name="Amboseli Escape", location="Kenya", description="Elephants.")
+
+    def test_repeat_render_skips_featured_query(self):
+        self.client.get(reverse("tours"))  # warm the cache
+        with self.assertNumQueries(2):  # only the listing and facet counts remain
+            response = self.client.get(reverse("tours"))
+        self.assertContains(response, "Amboseli Escape")
+
+    def test_tour_save_invalidates_cards(self):
+        self.client.get(reverse("tours"))
+        self.tour.name = "Amboseli Deluxe"
+        version = catalogue_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tour.save()
+            self.assertEqual(catalogue_version(), version)  # not before the commit
+        self.assertContains(self.client.get(reverse("tours")), "Amboseli Deluxe")
+
+    def test_new_rating_refreshes_only_that_card(self):
+        self.client.get(reverse("tours"))
+        version, modified_at = catalogue_version(), self.tour.modified_at
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(content="Superb", tour=self.tour, rating=5)
+        self.tour.refresh_from_db()
+        self.assertEqual((catalogue_version(), self.tour.modified_at), (version, modified_at))
+        self.assertContains(self.client.get(reverse("tours")), "(1 review)")
+
+    def test_bulk_feature_action_bumps_version_and_modified_at(self):
+        version, modified_at = catalogue_version(), self.tour.modified_at
+        request = RequestFactory().post("/")
+        request.user = User(is_staff=True)
+        model_admin = admin_site._registry[Tour]
+        model_admin.message_user = lambda *args, **kwargs: None
+        model_admin.mark_as_featured(request, Tour.objects.all())
+        self.assertNotEqual(catalogue_version(), version)
+        self.tour.refresh_from_db()
+        self.assertTrue(self.tour.is_featured)
+        self.assertGreater(self.tour.modified_at, modified_at)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class TourDetailTests(TestCase):
+    def setUp(self):
+        self.tour = Tour.objects.create(name="Serengeti Plains", location="Tanzania", description="Big cats.")
+        TourImage.objects.create(tour=self.tour, image="tours/gallery/lion.jpg", caption="Lion")
+        TourImage.objects.create(tour=self.tour, image="tours/gallery/cheetah.jpg", caption="Cheetah")
+        self.url = reverse("tour_detail", args=[self.tour.slug])
+
+    def test_gallery_is_prefetched(self):
+        # modified_at lookup, tour, gallery
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Cheetah")
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+    def test_revalidation_returns_304_with_one_query(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_rating_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        TourRating.objects.filter(tour=self.tour).update(modified_at=self.tour.modified_at.replace(year=2020))
+        Review.objects.create(content="Superb", tour=self.tour, rating=5)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "from 1 review")
+
+    def test_gallery_edit_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        Tour.objects.filter(pk=self.tour.pk).update(modified_at=self.tour.modified_at.replace(year=2020))
+        TourImage.objects.create(tour=self.tour, image="tours/gallery/zebra.jpg")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+def jpeg_upload(name="photo.jpg", size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_RENDITION_FORMATS=("webp",))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_upload_builds_webp_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tour = Tour.objects.create(name="Lake Nakuru", location="Kenya", description="Flamingos.",
+                                       image=jpeg_upload())
+        tour.refresh_from_db()
+        self.assertEqual([r["width"] for r in tour.image_renditions], [160, 320, 640, 1024, 1600])
+        self.assertEqual(tour.image_renditions[1]["height"], 160)
+        self.assertTrue(all(r["name"].endswith(".webp") for r in tour.image_renditions))
+        self.assertIn("1600w", srcset(tour))
+
+        response = self.client.get(reverse("tours"))
+        self.assertContains(response, "-640w.webp")
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tour = Tour.objects.create(name="Tsavo", location="Kenya", description="Red elephants.",
+                                       image=jpeg_upload(size=(500, 250)))
+        tour.refresh_from_db()
+        self.assertEqual([r["width"] for r in tour.image_renditions], [160, 320, 500])
+
+    @override_settings(IMAGE_RENDITIONS_ON_UPLOAD=False)
+    def test_bulk_command_fills_in_missing_renditions(self):
+        tour = Tour.objects.create(name="Samburu", location="Kenya", description="Reticulated giraffe.",
+                                   image=jpeg_upload())
+        self.assertEqual(tour.image_renditions, [])
+        call_command("generate_renditions", workers=1, stdout=StringIO())
+        tour.refresh_from_db()
+        self.assertEqual(len(tour.image_renditions), 5)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class PerformanceMiddlewareTests(TestCase):
+    def test_server_timing_reports_queries_and_templates(self):
+        Tour.objects.create(name="Ol Pejeta", location="Kenya", description="Rhino sanctuary.")
+        response = self.client.get(reverse("tour_detail", args=["ol-pejeta"]))
+        timing = response["Server-Timing"]
+        self.assertIn('desc="3 queries"', timing)
+        self.assertIn("tpl;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_transaction_control_is_not_counted(self):
+        for sql in ("BEGIN IMMEDIATE", "COMMIT", 'SAVEPOINT "s1_x1"', 'RELEASE SAVEPOINT "s1_x1"', "ROLLBACK"):
+            self.assertTrue(is_transaction_control(sql), sql)
+        self.assertFalse(is_transaction_control('INSERT INTO "main_review" ("name") VALUES (%s)'))
+
+    @override_settings(PERF_SLOW_SQL_SAMPLE_RATE=1.0, PERF_SLOW_REQUEST_MS=0)
+    def test_sampled_slow_request_logs_sql(self):
+        with self.assertLogs("main.performance", level="WARNING") as logs:
+            self.client.get(reverse("tours"))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["slow_request"], "/tours/")
+        self.assertTrue(any("main_tour" in entry["sql"] for entry in record["sql"]))
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        call_command("seed_catalogue", tours=20, gallery=2, reviews=50, stdout=StringIO())
+
+    def test_seeding_creates_catalogue(self):
+        self.assertEqual(Tour.objects.count(), 20)
+        self.assertEqual(TourImage.objects.count(), 40)
+        self.assertEqual(Review.objects.count(), 50)
+
+    def test_reseeding_with_clear_replaces_the_reviews(self):
+        call_command("seed_catalogue", tours=20, gallery=2, reviews=50, clear=True, stdout=StringIO())
+        self.assertEqual((Tour.objects.count(), Review.objects.count()), (20, 50))
+        self.assertEqual(get_count(REVIEWS), 50)
+
+    def test_benchmark_reports_every_scenario(self):
+        out = StringIO()
+        call_command("benchmark", iterations=5, json=True, no_budgets=True, stdout=out)
+        names = {result["name"] for result in json.loads(out.getvalue())}
+        self.assertTrue({"home", "tours", "tour_detail", "load_more_reviews", "submit_review"} <= names)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=600)
+    def test_benchmark_times_views_not_the_page_cache(self):
+        out = StringIO()
+        call_command("benchmark", iterations=2, only=["home", "tours"], json=True, no_budgets=True, stdout=out)
+        self.assertTrue(all(result["max_queries"] > 0 for result in json.loads(out.getvalue())))
+
+    @override_settings(ALLOWED_HOSTS=["bmsafaris.example"])  # as under manage.py, without the test runner's testserver
+    def test_benchmark_runs_outside_the_test_runner(self):
+        out = StringIO()
+        call_command("benchmark", iterations=2, only=["home", "contact"], no_budgets=True, stdout=out)
+        self.assertIn("contact", out.getvalue())
+
+    def test_benchmark_meets_checked_in_budgets(self):
+        out = StringIO()
+        call_command("benchmark", iterations=5, stdout=out)
+        self.assertIn("All budgets met", out.getvalue())
+
+    def test_benchmark_fails_on_unexpected_status(self):
+        missing = Scenario("missing", "GET", "/no-such-page/")
+        with mock.patch("main.management.commands.benchmark.default_scenarios", return_value=[missing]):
+            with self.assertRaisesMessage(CommandError, "missing: 2x 404"):
+                call_command("benchmark", iterations=2, no_budgets=True, stdout=StringIO())
+
+    def test_benchmark_fails_when_budget_exceeded(self):
+        budgets = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        self.addCleanup(shutil.os.remove, budgets.name)
+        json.dump({"tour_detail": {"max_queries": 0}}, budgets)
+        budgets.close()
+        with self.assertRaisesMessage(CommandError, "tour_detail"):
+            call_command("benchmark", iterations=2, budgets=budgets.name, stdout=StringIO())
+
+
+@mock.patch.dict(settings.DATABASES, {"replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": "replica.sqlite3"}})
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def handle(self, view, cookies=None):
+        """Run a fake view through the pinning middleware; returns (response, routes)."""
+        routes = []
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies or {})
+        response = ReplicaPinningMiddleware(lambda req: view(routes) or HttpResponse())(request)
+        return response, routes
+
+    def test_reads_go_to_replica(self):
+        response, routes = self.handle(lambda routes: routes.append(self.router.db_for_read(Review)))
+        self.assertEqual(routes, ["replica"])
+        self.assertNotIn("db_pin", response.cookies)
+
+    def test_write_pins_rest_of_request_and_sets_cookie(self):
+        def view(routes):
+            routes.append(self.router.db_for_write(Review))
+            routes.append(self.router.db_for_read(Review))
+        response, routes = self.handle(view)
+        self.assertEqual(routes, ["default", "default"])
+        self.assertEqual(response.cookies["db_pin"]["max-age"], settings.REPLICA_PIN_SECONDS)
+
+    def test_pin_cookie_keeps_client_on_primary(self):
+        _, routes = self.handle(lambda routes: routes.append(self.router.db_for_read(Review)), {"db_pin": "1"})
+        self.assertEqual(routes, ["default"])
+
+    def test_unrouted_apps_and_migrations(self):
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertFalse(self.router.allow_migrate("replica", "main"))
+
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    """Runs real worker processes against a throwaway file-backed SQLite database."""
+
+    def manage(self, *args, **extra_env):
+        env = dict(os.environ, SQLITE_PATH=self.db_path, **extra_env)
+        env.pop("DATABASE_URL", None)
+        return subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), *args],
+            env=env, capture_output=True, text=True, timeout=120,
+        )
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.db_path = os.path.join(tmp, "stress.sqlite3")
+        self.assertEqual(self.manage("migrate", "-v0").returncode, 0)
+
+    def test_concurrent_review_writers_never_hit_lock_errors(self):
+        result = self.manage("sqlite_write_stress", "--workers", "12", "--writes", "40", SQLITE_WAL="True")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("480 review(s) written, 0 lock error(s)", result.stdout)
+
+    def test_wal_is_opt_in(self):
+        query = "from django.db import connection; print(connection.cursor().execute('PRAGMA journal_mode').fetchone()[0])"
+        self.assertEqual(self.manage("shell", "-v0", "-c", query).stdout.strip(), "delete")
+        self.assertFalse(os.path.exists(self.db_path + "-wal"))
+        self.assertEqual(self.manage("shell", "-v0", "-c", query, SQLITE_WAL="True").stdout.strip(), "wal")
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)  # exercise the uncached path
+class ReviewCounterTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user("staff", password="pw", is_staff=True)
+
+    def test_counter_follows_creates_and_deletes(self):
+        reviews = [Review.objects.create(content=f"Review {i}") for i in range(3)]
+        self.assertEqual(get_count(REVIEWS), 3)
+
+        self.client.force_login(self.staff)
+        self.client.post(reverse("delete_review", args=[reviews[0].id]))
+        Review.objects.filter(pk=reviews[1].pk).delete()  # admin-style queryset delete
+        self.assertEqual(get_count(REVIEWS), 1)
+
+    def test_home_reads_counter_instead_of_counting(self):
+        for i in range(5):
+            Review.objects.create(content=f"Review {i}")
+        with self.assertNumQueries(2):  # first page + counter row
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.context["total_reviews"], 5)
+
+    def test_reconcile_repairs_drift(self):
+        Review.objects.create(content="Lovely")
+        Counter.objects.filter(name=REVIEWS).update(value=42)
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("-41", out.getvalue())
+        self.assertEqual(get_count(REVIEWS), 1)
+
+
+class TourRatingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tour = Tour.objects.create(name="Mara Classic", description="Big cats")
+        self.other = Tour.objects.create(name="Amboseli Escape", description="Elephants")
+
+    def rating(self, tour):
+        return TourRating.objects.get(tour=tour)
+
+    def test_aggregate_follows_creates_edits_and_deletes(self):
+        five = Review.objects.create(content="Superb", tour=self.tour, rating=5)
+        three = Review.objects.create(content="Fine", tour=self.tour, rating=3)
+        Review.objects.create(content="No stars", tour=self.tour)
+        rating = self.rating(self.tour)
+        self.assertEqual((rating.count, rating.total, rating.average), (2, 8, 4.0))
+        self.assertEqual(rating.histogram()[0], (5, 1, 50))
+
+        three.rating = 4
+        three.save()
+        five.tour = self.other
+        five.save()
+        self.assertEqual((self.rating(self.tour).count, self.rating(self.tour).stars_4), (1, 1))
+        self.assertEqual(self.rating(self.other).total, 5)
+
+        Review.objects.filter(pk=three.pk).delete()  # admin-style queryset delete
+        self.assertEqual((self.rating(self.tour).count, self.rating(self.tour).total), (0, 0))
+
+    def test_submit_review_rates_tour(self):
+        response = self.client.post(
+            reverse("submit_review"), {"content": "Loved it", "rating": 4, "tour": self.tour.pk}, **AJAX
+        )
+        self.assertEqual(response.json()["review"]["stars"], "★★★★☆")
+        self.assertEqual(self.rating(self.tour).average, 4.0)
+
+    def test_listing_reads_ratings_without_per_card_queries(self):
+        for tour in (self.tour, self.other):
+            Review.objects.create(content="Great", tour=tour, rating=5)
+        # featured + all tours (ratings joined in), facet counts, location options
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("tours"))
+        self.assertContains(response, "(1 review)", count=2)
+
+    def test_rebuild_repairs_drift(self):
+        Review.objects.create(content="Great", tour=self.tour, rating=5)
+        TourRating.objects.filter(tour=self.tour).update(count=9, total=1)
+        rebuild_ratings()
+        rating = self.rating(self.tour)
+        self.assertEqual((rating.count, rating.total, rating.stars_5), (1, 5, 1))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tour = Tour.objects.create(name="Tsavo Trails", location="Kenya", description="Red elephants.")
+        self.staff = User.objects.create_user("staff", password="pw", is_staff=True)
+
+    def test_anonymous_hit_skips_orm_and_templates(self):
+        self.client.get(reverse("tours"))
+        with self.assertNumQueries(0), mock.patch("main.views.render") as render:
+            response = self.client.get(reverse("tours"))
+        render.assert_not_called()
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertContains(response, "Tsavo Trails")
+
+    def test_cached_pages_embed_no_csrf_token(self):
+        response = self.client.get(reverse("home"))
+        self.assertNotContains(response, 'name="csrfmiddlewaretoken"')
+        self.assertFalse(response.cookies)
+        token = self.client.get(reverse("csrf")).json()["token"]
+        self.assertTrue(token)
+
+    def test_staff_get_their_own_copy(self):
+        self.client.get(reverse("tours"))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("tours"))
+        self.assertContains(response, reverse("admin:main_tour_change", args=[self.tour.id]))
+
+    def test_new_review_invalidates_home(self):
+        self.client.get(reverse("home"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(content="Unforgettable sunsets")
+        self.assertContains(self.client.get(reverse("home")), "Unforgettable sunsets")
+
+    def test_cached_tour_page_still_revalidates(self):
+        url = reverse("tour_detail", args=[self.tour.slug])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pending_messages_bypass_cache(self):
+        self.client.get(reverse("about"))
+        self.client.post(reverse("contact"), {"name": "Amani", "email": "amani@example.com", "message": "Hi"})
+        self.assertContains(self.client.get(reverse("about")), "Thanks for reaching out!")
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    MESSAGE_STORAGE="django.contrib.messages.storage.cookie.CookieStorage",
+)
+class LeanAnonymousTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tour = Tour.objects.create(name="Samburu Sands", location="Kenya", description="Reticulated giraffes.")
+
+    def test_first_visit_to_about_runs_no_sql(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("about"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_tour_page_runs_no_sql(self):
+        url = reverse("tour_detail", args=[self.tour.slug])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "Samburu Sands")
+
+    def test_returning_visitor_with_session_and_messages_runs_no_sql(self):
+        session = self.client.session
+        session["seen_intro"] = True
+        session.save()
+        self.client.post(reverse("contact"), {"name": "Amani", "email": "amani@example.com", "message": "Hi"})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("about"))
+        self.assertContains(response, "Thanks for reaching out!")
+
+
+class JsonlTransferTests(TestCase):
+    def setUp(self):
+        self.tour = Tour.objects.create(name="Lamu Dhow Cruise", location="Kenya", description="Swahili coast.", price=1250)
+        TourImage.objects.create(tour=self.tour, image="tours/gallery/dhow.jpg", caption="Dhow")
+        Review.objects.create(content="Magical", tour=self.tour, rating=5)
+        Review.objects.create(content="Great guides")
+        Review.objects.filter(content="Magical").update(created_at="2024-03-01T09:00:00Z")
+
+    def export(self):
+        out = StringIO()
+        call_command("export_jsonl", stdout=out, stderr=StringIO())
+        path = os.path.join(tempfile.mkdtemp(), "catalogue.jsonl.gz")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command("export_jsonl", path, stderr=StringIO())
+        return out.getvalue(), path
+
+    def test_round_trip_into_empty_database(self):
+        Review.objects.create(content="Spam", tour=self.tour, rating=1, is_hidden=True)
+        text, path = self.export()
+        self.assertEqual(len(text.splitlines()), 5)
+        Tour.objects.all().delete()
+        Review.objects.all().delete()
+        OutboundEmail.objects.all().delete()
+
+        call_command("import_jsonl", path, batch_size=2, stdout=StringIO())
+
+        tour = Tour.objects.get(slug="lamu-dhow-cruise")
+        self.assertEqual(tour.gallery.get().caption, "Dhow")
+        magical = Review.objects.get(content="Magical")
+        self.assertEqual((magical.tour, magical.created_at.year), (tour, 2024))
+        self.assertTrue(Review.objects.get(content="Spam").is_hidden)
+        self.assertEqual(get_count(REVIEWS), 2)
+        self.assertEqual(TourRating.objects.get(tour=tour).count, 1)  # the hidden review stays out
+        self.assertEqual(search_tours("dhow")[0].get(), tour)
+        self.assertFalse(OutboundEmail.objects.exists())  # no notification per imported review
+
+    def test_reimport_upserts_tours_by_slug(self):
+        text, path = self.export()
+        changed = text.replace("Lamu Dhow Cruise", "Lamu Sunset Cruise")
+        with mock.patch("sys.stdin", StringIO(changed)):
+            call_command("import_jsonl", "-", stdout=StringIO())
+        self.assertEqual(Tour.objects.get().name, "Lamu Sunset Cruise")
+        self.assertEqual(TourImage.objects.count(), 1)
+        self.assertEqual(Review.objects.count(), 4)  # reviews have no natural key; they are appended
+
+    def test_bad_line_reports_its_number(self):
+        with mock.patch("sys.stdin", StringIO('{"model": "main.tour", "fields": {}}\nnot json\n')):
+            with self.assertRaisesMessage(CommandError, "line 2"):
+                call_command("import_jsonl", "-", stdout=StringIO())
+
+    def test_rejected_batch_reports_its_lines_and_keeps_earlier_ones(self):
+        lines = (
+            '{"model": "main.tour", "fields": {"slug": "meru", "name": "Meru", "description": "Lions."}}\n'
+            '{"model": "main.review", "fields": {"content": "Odd", "rating": -1}}\n'
+        )
+        with mock.patch("sys.stdin", StringIO(lines)):
+            with self.assertRaisesMessage(CommandError, "lines 2-2"):
+                call_command("import_jsonl", "-", batch_size=1, stdout=StringIO())
+        self.assertFalse(Review.objects.filter(content="Odd").exists())
+        self.assertEqual(search_tours("meru")[0].get().slug, "meru")  # derived data still refreshed
+
+
+class TourFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old = Tour.objects.create(name="Nakuru Flamingos", location="Kenya", description="Pink lakes.")
+        TourImage.objects.create(tour=self.old, image="tours/gallery/flamingo.jpg", caption="Flamingos")
+        Tour.objects.filter(pk=self.old.pk).update(modified_at="2024-01-01T00:00:00Z")
+        self.new = Tour.objects.create(name="Hell's Gate Cycling", location="Kenya", description="Gorges.")
+        self.url = reverse("tour_feed")
+
+    def records(self, response):
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_streams_one_record_per_tour_with_gallery(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = self.records(response)
+        self.assertEqual([r["slug"] for r in records], [self.old.slug, self.new.slug])
+        self.assertEqual(records[0]["gallery"][0]["url"], "http://testserver/media/tours/gallery/flamingo.jpg")
+
+    def test_since_returns_only_later_changes(self):
+        response = self.client.get(self.url, {"since": "2025-01-01T00:00:00+00:00"})
+        self.assertEqual([r["slug"] for r in self.records(response)], [self.new.slug])
+        self.assertEqual(self.client.get(self.url, {"since": "yesterday"}).status_code, 400)
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_unchanged_catalogue_revalidates_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(TOUR_FEED_CHUNK_SIZE=1)
+    async def test_asgi_streams_before_the_feed_is_built(self):
+        produced = []
+
+        def tracked(request, since=None):
+            for line in feed_lines(request, since):
+                produced.append(line)
+                yield line
+
+        with mock.patch("main.views.feed_lines", tracked):
+            response = await self.async_client.get(self.url)
+            content = aiter(response.streaming_content)
+            first = await anext(content)
+            self.assertEqual(json.loads(first)["slug"], self.old.slug)
+            self.assertEqual(produced, [first])  # the second tour hasn't been read yet
+            self.assertEqual(json.loads(await anext(content))["slug"], self.new.slug)
+
+
+class AsyncViewTests(TestCase):
+    @override_settings(DEBUG=True)  # Django only logs "handler adapted for middleware" in debug
+    def test_middleware_stack_stays_async(self):
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    async def test_contact_queues_mail_from_async_view(self):
+        response = await self.async_client.post(
+            reverse("contact"), {"name": "Amani", "email": "amani@example.com", "message": "Hi"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await OutboundEmail.objects.acount(), 2)
+
+    async def test_submit_review_from_async_view(self):
+        tour = await Tour.objects.acreate(name="Meru Wilderness", location="Kenya", description="Rhinos.")
+        response = await self.async_client.post(
+            reverse("submit_review"), {"content": "Wild", "rating": 5, "tour": tour.pk},
+            headers={"x-requested-with": "XMLHttpRequest"},
+        )
+        self.assertEqual(response.json()["review"]["stars"], "★★★★★")
+        self.assertIn('desc="', response["Server-Timing"])
+        self.assertEqual(await Review.objects.filter(tour=tour).acount(), 1)
+
+
+class ReviewStreamTests(TestCase):
+    async def test_publish_from_another_thread_reaches_every_stream(self):
+        hub = Broadcaster()
+        first, second = hub.subscribe(), hub.subscribe()
+        await asyncio.to_thread(hub.publish, "review-deleted", {"id": 7})
+        for subscription in (first, second):
+            message = await asyncio.wait_for(subscription.queue.get(), 1)
+            self.assertEqual(message, 'event: review-deleted\ndata: {"id": 7}\n\n')
+
+    @override_settings(REVIEW_STREAM_QUEUE_SIZE=2)
+    async def test_slow_stream_is_told_to_resync(self):
+        hub = Broadcaster()
+        subscription = hub.subscribe()
+        for n in range(5):
+            hub.publish("review-deleted", {"id": n})
+        await asyncio.sleep(0)  # run the queued offers
+        self.assertEqual(subscription.queue.qsize(), 1)
+        self.assertEqual(subscription.queue.get_nowait(), RESYNC)
+
+    @override_settings(REVIEW_STREAM_MAX_CLIENTS=1)
+    async def test_connection_cap(self):
+        hub = Broadcaster()
+        hub.subscribe()
+        with self.assertRaises(TooManyStreams):
+            hub.subscribe()
+
+    async def test_stream_endpoint(self):
+        response = await self.async_client.get(reverse("review_stream"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), b"retry: 5000\n\n")
+        self.assertEqual(len(broadcaster), 1)
+        await asyncio.to_thread(broadcaster.publish, "review-deleted", {"id": 3})
+        self.assertIn(b"review-deleted", await asyncio.wait_for(anext(content), 1))
+        # ASGIHandler cancels the response task when the client disconnects.
+        pending = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(len(broadcaster), 0)
+
+    async def test_unread_stream_holds_no_slot(self):
+        response = await self.async_client.get(reverse("review_stream"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(broadcaster), 0)  # the client left before the body started
+        await response.streaming_content.aclose()
+
+    @override_settings(REVIEW_STREAM_MAX_CLIENTS=1)
+    async def test_stream_endpoint_at_the_cap(self):
+        subscription = broadcaster.subscribe()
+        self.addCleanup(broadcaster.unsubscribe, subscription)
+        response = await self.async_client.get(reverse("review_stream"))
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "30"))
+        # A stream that loses the race for the last slot tells the browser to back off.
+        self.assertEqual([message async for message in stream(1)], ["retry: 30000\n\n"])
+
+    def test_stream_needs_asgi(self):
+        self.assertEqual(self.client.get(reverse("review_stream")).status_code, 501)
+
+    def test_committed_reviews_are_published(self):
+        with mock.patch.object(broadcaster, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                review = Review.objects.create(content="Great trip")
+            created, review_id = review.as_json(), review.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                review.delete()
+        self.assertEqual(publish.call_args_list, [
+            mock.call("review-created", created),
+            mock.call("review-deleted", {"id": review_id}),
+        ])
+
+
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_superuser("admin", password="pw")
+        self.client.force_login(self.staff)
+        self.old = Review.objects.create(name="Wanjiru", content="Saw the big five at dawn")
+        self.new = Review.objects.create(name="Tom", content="Elephants everywhere")
+
+    def test_review_search_uses_the_index(self):
+        self.assertEqual(list(search_reviews("wanj")), [self.old])
+        self.assertEqual(list(search_reviews("big daw")), [self.old])
+        self.new.content = "Dawn drives were the highlight"
+        self.new.save()
+        self.old.delete()
+        self.assertEqual(list(search_reviews("dawn")), [self.new])
+
+        Review.objects.bulk_create([Review(content=f"Dawn game drive {i}") for i in range(3)])
+        self.assertEqual(rebuild_review_index(), 4)
+        newest = list(Review.objects.order_by("-id").values_list("pk", flat=True)[:2])
+        self.assertEqual(sorted(search_reviews("dawn", limit=2).values_list("pk", flat=True)), sorted(newest))
+
+    def test_rebuild_command_repairs_both_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM main_review_fts")  # e.g. after raw SQL edits
+        self.assertEqual(list(search_reviews("dawn")), [])
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Indexed 0 tour(s)", out.getvalue())
+        self.assertIn("Indexed 2 review(s)", out.getvalue())
+        self.assertEqual(list(search_reviews("dawn")), [self.old])
+
+    def test_review_changelist_search(self):
+        url = reverse("admin:main_review_changelist")
+        self.assertContains(self.client.get(url, {"q": "elephant"}), "Elephants everywhere")
+        response = self.client.get(url, {"q": str(self.old.pk)})
+        self.assertEqual(list(response.context["cl"].result_list), [self.old])
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_MIN=1)
+    def test_unfiltered_count_is_estimated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        Review.objects.create(content="Not in the statistics yet")
+        self.assertEqual(EstimatedCountPaginator(Review.objects.all(), 100).count, 2)
+        self.assertEqual(EstimatedCountPaginator(Review.objects.filter(rating=None), 100).count, 3)
+        response = self.client.get(reverse("admin:main_review_changelist"))
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+    def test_tour_location_filter_is_cached(self):
+        Tour.objects.create(name="Amboseli", location="Kenya", description="Elephants.")
+        url = reverse("admin:main_tour_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"location": "Kenya"})
+        self.assertContains(response, "Amboseli")
+        self.assertFalse([q for q in queries if "DISTINCT" in q["sql"]])
+
+    def test_thumbnails_never_use_the_original(self):
+        tour = Tour(name="Amboseli", location="Kenya", description="Elephants.", image="tours/big.jpg")
+        self.assertEqual(thumbnail_url(tour), "")
+        tour.image_renditions = [
+            {"source": "tours/big.jpg", "name": f"renditions/tours/big-{w}w.webp", "format": "webp", "width": w}
+            for w in (160, 320)
+        ]
+        self.assertTrue(thumbnail_url(tour).endswith("big-160w.webp"))
+
+
+class ModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tour = Tour.objects.create(name="Mara Classic", description="Big cats")
+        self.good = Review.objects.create(name="Amani", content="Superb guides", tour=self.tour, rating=5)
+        self.spam = [
+            Review.objects.create(name="Spammer", content=f"Cheap pills {i}", tour=self.tour, rating=1 + i % 2)
+            for i in range(4)
+        ]
+
+    def rating(self):
+        rating = TourRating.objects.get(tour=self.tour)
+        return rating.count, rating.total, rating.stars_1, rating.stars_2
+
+    def test_hide_restore_and_delete_keep_derived_data_in_step(self):
+        spam = Review.objects.filter(name="Spammer")
+        version = reviews_version()
+        with mock.patch.object(broadcaster, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(moderate(spam, HIDE), 4)
+        publish.assert_called_once_with("resync", {})
+        self.assertEqual(reviews_version(), version + 1)
+        self.assertEqual(get_count(REVIEWS), 1)
+        self.assertEqual(self.rating(), (1, 5, 0, 0))
+        self.assertEqual(moderate(spam, HIDE), 0)  # already hidden
+
+        self.assertEqual(moderate(spam.filter(pk=self.spam[0].pk), RESTORE), 1)
+        self.assertEqual((get_count(REVIEWS), self.rating()), (2, (2, 6, 1, 0)))
+
+        self.assertEqual(moderate(spam, DELETE), 4)
+        self.assertEqual((get_count(REVIEWS), self.rating()), (1, (1, 5, 0, 0)))
+        self.assertEqual(list(Review.objects.all()), [self.good])
+        self.assertEqual(list(search_reviews("cheap")), [])
+
+    def test_hidden_reviews_leave_the_public_pages(self):
+        moderate(Review.objects.filter(pk=self.spam[-1].pk), HIDE)
+        response = self.client.get(reverse("home"))
+        self.assertNotIn(self.spam[-1], response.context["reviews"])
+        self.assertEqual(response.context["total_reviews"], 4)
+
+        # Hiding one review from its admin form goes through the signals instead
+        review = self.spam[0]
+        review.is_hidden = True
+        review.save()
+        self.assertEqual((get_count(REVIEWS), self.rating()[0]), (3, 3))
+
+    def test_endpoint(self):
+        url = reverse("moderate_reviews")
+        self.assertEqual(self.client.post(url, {"action": HIDE, "ids": "1"}).status_code, 302)
+        self.client.force_login(User.objects.create_user("staff", password="pw", is_staff=True))
+
+        self.assertEqual(self.client.post(url, {"action": DELETE}).status_code, 400)  # nothing selected
+        self.assertEqual(self.client.post(url, {"action": DELETE, "ids": "1,x"}).status_code, 400)
+
+        ids = f"{self.spam[0].pk},{self.spam[1].pk}"
+        with self.assertNumQueries(8):  # session + user, then however many reviews: one rating UPDATE per affected tour
+            response = self.client.post(url, {"action": HIDE, "ids": ids})
+        self.assertEqual(response.json(), {"success": True, "action": HIDE, "count": 2})
+        response = self.client.post(url, {"action": DELETE, "name": "spammer", "contains": "pills"})
+        self.assertEqual(response.json()["count"], 4)
+        self.assertEqual(list(Review.objects.all()), [self.good])
+
+    def test_admin_actions(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="pw"))
+        url = reverse("admin:main_review_changelist")
+        selected = [review.pk for review in self.spam]
+        self.client.post(url, {"action": "hide_reviews", "_selected_action": selected})
+        self.assertEqual(Review.objects.filter(is_hidden=True).count(), 4)
+        self.client.post(url, {"action": "delete_selected", "_selected_action": selected, "post": "yes"})
+        self.assertEqual(list(Review.objects.all()), [self.good])
+        self.assertEqual(get_count(REVIEWS), 1)
+
+
+@override_settings(THROTTLE_RATES={"review": "2/min", "contact": "1/min", "booking": "1/min"})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clock = mock.patch("main.throttle.time")  # the start of a minute, so no test straddles a window
+        clock.start().time.return_value = 6_000_000.0
+        self.addCleanup(clock.stop)
+
+    def submit(self, **extra):
+        return self.client.post(reverse("submit_review"), {"content": "Great trip"}, **AJAX, **extra)
+
+    def test_burst_then_429_per_client(self):
+        self.assertTrue(self.submit().json()["success"])
+        # submit_review is async: once the window's counter exists, one atomic aincr per POST.
+        with mock.patch.object(cache, "aincr", wraps=cache.aincr) as aincr, \
+                mock.patch.object(cache, "aadd") as aadd:
+            self.assertTrue(self.submit().json()["success"])
+        self.assertEqual(aincr.call_count, 1)
+        aadd.assert_not_called()
+        response = self.submit()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")  # until the minute's window ends
+        self.assertEqual(Review.objects.count(), 2)
+
+        # The home page form shares the scope; other clients are unaffected.
+        self.assertEqual(self.client.post(reverse("home"), {"content": "Again"}).status_code, 429)
+        self.assertTrue(self.submit(REMOTE_ADDR="10.0.0.9").json()["success"])
+        self.assertEqual(self.client.get(reverse("home")).status_code, 200)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+    def test_session_is_limited_across_addresses(self):
+        self.client.force_login(User.objects.create_user("guest", password="pw"))
+        self.submit(REMOTE_ADDR="10.0.0.1")
+        self.submit(REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(self.submit(REMOTE_ADDR="10.0.0.3").status_code, 429)
+
+        request = RequestFactory().post("/")
+        request.session = mock.Mock(session_key="x" * 400)
+        self.assertEqual(len(throttle_keys(request, "review")[1]), len("throttle:review:session:") + 32)
+        with override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies"):
+            self.assertEqual(len(throttle_keys(request, "review")), 1)  # the cookie changes on every write
+
+    async def test_async_view(self):
+        url = reverse("contact")
+        self.assertEqual((await self.async_client.post(url, {"message": "Hi"})).status_code, 302)
+        response = await self.async_client.post(url, {"message": "Hi again"})
+        self.assertEqual((response.status_code, response["Retry-After"]), (429, "60"))
+
+    @override_settings(THROTTLE_MAX_IN_FLIGHT=1)
+    def test_in_flight_cap(self):
+        self.assertTrue(in_flight.acquire())
+        try:
+            response = self.submit()
+        finally:
+            in_flight.release()
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "5"))
+        self.assertEqual(in_flight.count, 0)
+        # The 503 spent none of the burst of two.
+        self.assertEqual(self.submit().status_code, 200)
+        self.assertEqual(self.submit().status_code, 200)
+        self.assertEqual(self.submit().status_code, 429)
+        self.assertEqual(in_flight.count, 0)
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4")
+        self.assertEqual(client_ip(request), "1.2.3.4")  # not the client-supplied 6.6.6.6
+        self.assertEqual(client_ip(RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")), "10.0.0.1")
+        with override_settings(THROTTLE_PROXY_COUNT=0):
+            self.assertEqual(client_ip(request), "10.0.0.1")
+
+    @override_settings(THROTTLE_PROXY_COUNT=0)
+    def test_forged_forwarded_for_is_ignored_without_proxies(self):
+        client = {"REMOTE_ADDR": "10.0.0.7"}  # connecting directly
+        self.submit(HTTP_X_FORWARDED_FOR="1.1.1.1", **client)
+        self.submit(HTTP_X_FORWARDED_FOR="2.2.2.2", **client)
+        self.assertEqual(self.submit(HTTP_X_FORWARDED_FOR="3.3.3.3", **client).status_code, 429)
+        self.assertEqual(Review.objects.count(), 2)
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_forwarded_clients_get_separate_budgets(self):
+        proxy = {"REMOTE_ADDR": "10.0.0.1"}  # every request arrives through the same proxy
+        self.submit(HTTP_X_FORWARDED_FOR="1.1.1.1", **proxy)
+        self.submit(HTTP_X_FORWARDED_FOR="1.1.1.1", **proxy)
+        self.assertEqual(self.submit(HTTP_X_FORWARDED_FOR="1.1.1.1", **proxy).status_code, 429)
+        self.assertTrue(self.submit(HTTP_X_FORWARDED_FOR="2.2.2.2", **proxy).json()["success"])
+
+
+@override_settings(SITEMAP_SHARD_SIZE=2, SITE_URL="https://example.com")
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        with self.captureOnCommitCallbacks(execute=True):  # so each test starts outside a pending update
+            self.tours = [
+                Tour.objects.create(name=name, location="Kenya", description="Wildlife.")
+                for name in ("Amboseli", "Tsavo", "Samburu")
+            ]
+
+    def shard(self, name):
+        response = self.client.get(reverse("sitemap_shard", args=[name]))
+        self.assertEqual(response["Content-Type"], "application/x-gzip")
+        return gzip.decompress(b"".join(response.streaming_content)).decode()
+
+    def test_index_is_built_once_and_served_from_storage(self):
+        response = self.client.get(reverse("sitemap"))
+        index = b"".join(response.streaming_content).decode()
+        self.assertEqual(response["Content-Type"], "application/xml")
+        for name in ("pages", "tours-0", "tours-1"):
+            self.assertIn(f"<loc>https://example.com/sitemaps/{name}.xml.gz</loc>", index)
+        self.assertIn("<loc>https://example.com/tours/tsavo/</loc><lastmod>", self.shard("tours-0"))
+        self.assertNotIn("samburu", self.shard("tours-0"))
+        self.assertIn("https://example.com/about/", self.shard("pages"))
+
+        with mock.patch.object(sitemap, "build_all") as build_all, self.assertNumQueries(0):
+            again = self.client.get(reverse("sitemap"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        build_all.assert_not_called()
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get(reverse("sitemap_shard", args=["tours-9"])).status_code, 404)
+
+    def test_tour_changes_rebuild_only_their_shard(self):
+        call_command("build_sitemaps", stdout=StringIO())
+        samburu = self.tours[2]
+        with mock.patch.object(sitemap, "build_shard", wraps=sitemap.build_shard) as build_shard:
+            with self.captureOnCommitCallbacks(execute=True):
+                samburu.slug = "samburu-reserve"
+                samburu.save()
+        build_shard.assert_called_once_with(1)
+        self.assertIn("/tours/samburu-reserve/", self.shard("tours-1"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            samburu.delete()
+        self.assertEqual(self.client.get(reverse("sitemap_shard", args=["tours-1"])).status_code, 404)
+        index = b"".join(self.client.get(reverse("sitemap")).streaming_content).decode()
+        self.assertNotIn("tours-1", index)
+
+    def test_no_incremental_updates_before_a_full_build(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tour.objects.create(name="Meru", location="Kenya", description="Lions.")
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "sitemaps")))
+
+
+    @override_settings(IMAGE_RENDITIONS_ON_UPLOAD=False)
+    def test_one_transaction_rebuilds_each_shard_once(self):
+        call_command("build_sitemaps", stdout=StringIO())
+        tsavo = self.tours[1]
+        with mock.patch.object(sitemap, "build_shard", wraps=sitemap.build_shard) as build_shard, \
+                mock.patch.object(sitemap, "build_index", wraps=sitemap.build_index) as build_index:
+            with self.captureOnCommitCallbacks(execute=True):
+                for tour in self.tours:
+                    tour.save()
+                TourImage.objects.create(tour=tsavo, image="tours/gallery/tsavo.jpg")
+        self.assertEqual(build_shard.call_args_list, [mock.call(0), mock.call(1)])
+        build_index.assert_called_once_with()
+
+    def test_import_rebuilds_a_built_sitemap(self):
+        call_command("build_sitemaps", stdout=StringIO())
+        line = '{"model": "main.tour", "fields": {"slug": "meru", "name": "Meru", "location": "Kenya", "description": "Lions."}}\n'
+        with mock.patch("sys.stdin", StringIO(line)):
+            call_command("import_jsonl", "-", stdout=StringIO())
+        self.assertIn("/tours/meru/", self.shard("tours-1"))
+
+    def test_rebuild_replaces_files_without_a_gap(self):
+        call_command("build_sitemaps", stdout=StringIO())
+        with default_storage.open(sitemap.INDEX) as reader, \
+                mock.patch.object(default_storage, "delete", side_effect=AssertionError("gap")):
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ("Meru", "Lamu"):  # ids 4 and 5: the second one opens shard 2
+                    Tour.objects.create(name=name, location="Kenya", description="Wildlife.")
+            self.assertNotIn(b"tours-2", reader.read())  # an open reader keeps the old file
+        self.assertIn("tours-2", b"".join(self.client.get(reverse("sitemap")).streaming_content).decode())
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, "sitemaps"))), [
+            "pages.xml.gz", "sitemap.xml", "tours-0.xml.gz", "tours-1.xml.gz", "tours-2.xml.gz",
+        ])
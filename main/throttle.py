@@ -0,0 +1,170 @@
+"""
+Admission control for the anonymous write endpoints (review, contact and
+booking POSTs), which each insert rows and queue email.
+
+Rate: every scope in THROTTLE_RATES allows "n/period" per client, counted
+in fixed windows of one period. A client is keyed by IP and, when it has a
+server-side session, by a hash of the session key; a request must be
+within the rate for both. Each key's window count is bumped with one
+atomic cache incr (an add when the window is new), so concurrent requests
+can't spend the same slot, and an anonymous visitor's POST costs a single
+cache round trip (two with a session). Redis increments atomically; the
+file cache used without REDIS_URL reads and rewrites the counter, so racing
+requests there can still slip a few extra through. Refused requests count too, which
+only keeps a flooding client refused. A client can get up to 2n through
+around a window boundary, which is fine for flood control.
+
+Concurrency: at most THROTTLE_MAX_IN_FLIGHT throttled requests run at once
+in each process; any more get an immediate 503 instead of tying up workers
+and the database behind a flood. The cap is checked before the rate, so a
+503 neither touches the cache nor spends one of the client's requests.
+
+GET requests pass straight through.
+"""
+import hashlib
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+PERIODS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60)"""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    """
+    The client's address. Behind THROTTLE_PROXY_COUNT trusted proxies it is
+    that many entries from the right of X-Forwarded-For; anything further
+    left was sent by the client and can be forged.
+    """
+    hops = settings.THROTTLE_PROXY_COUNT
+    if hops:
+        forwarded = [part.strip() for part in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _keys(request, scope):
+    keys = [f"throttle:{scope}:ip:{client_ip(request)}"]
+    session = getattr(request, "session", None)
+    # With signed-cookie sessions the "key" is the whole cookie and changes on
+    # every session write, so it can't identify a client; the IP key still applies.
+    if session is not None and session.session_key and not settings.SESSION_ENGINE.endswith("signed_cookies"):
+        digest = hashlib.sha256(session.session_key.encode()).hexdigest()[:32]
+        keys.append(f"throttle:{scope}:session:{digest}")
+    return keys
+
+
+def _window(scope, now):
+    """(limit, window number, seconds left in the window) for a scope's rate."""
+    count, period = parse_rate(settings.THROTTLE_RATES[scope])
+    return count, int(now // period), period - now % period
+
+
+def _hit(key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:  # first request in this window
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)  # another request added it first
+
+
+async def _ahit(key, timeout):
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        if await cache.aadd(key, 1, timeout):
+            return 1
+        return await cache.aincr(key)
+
+
+class InFlight:
+    """Per-process count of throttled requests being handled."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.count >= settings.THROTTLE_MAX_IN_FLIGHT:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+
+in_flight = InFlight()
+
+
+def _refuse(request, status, retry_after, message):
+    retry_after = max(1, math.ceil(retry_after))
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        response = JsonResponse({"success": False, "error": message}, status=status)
+    else:
+        response = HttpResponse(message, status=status, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def _too_many(request, wait):
+    return _refuse(request, 429, wait, "Too many submissions. Please wait a moment and try again.")
+
+
+def _busy(request):
+    return _refuse(request, 503, 5, "We're busy right now. Please try again in a few seconds.")
+
+
+def throttle(scope):
+    """
+    Rate-limit a view's POSTs by THROTTLE_RATES[scope] and count them against
+    the in-flight cap. Works on sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method != "POST":
+                    return await view(request, *args, **kwargs)
+                if not in_flight.acquire():
+                    return _busy(request)
+                try:
+                    limit, window, wait = _window(scope, time.time())
+                    for key in _keys(request, scope):
+                        if await _ahit(f"{key}:{window}", math.ceil(wait)) > limit:
+                            return _too_many(request, wait)
+                    return await view(request, *args, **kwargs)
+                finally:
+                    in_flight.release()
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method != "POST":
+                    return view(request, *args, **kwargs)
+                if not in_flight.acquire():
+                    return _busy(request)
+                try:
+                    limit, window, wait = _window(scope, time.time())
+                    for key in _keys(request, scope):
+                        if _hit(f"{key}:{window}", math.ceil(wait)) > limit:
+                            return _too_many(request, wait)
+                    return view(request, *args, **kwargs)
+                finally:
+                    in_flight.release()
+        return wrapper
+    return decorator
@@ -7,15 +7,23 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("about/", views.about, name="about"),
     path("contact/", views.contact, name="contact"),
+    path("csrf/", views.csrf, name="csrf"),
 
     # Tours
     path("tours/", views.tours, name="tours"),
     path("tours/<slug:slug>/", views.tour_detail, name="tour_detail"),  # ✅ now uses slug
+    path("feed/v1/tours.ndjson", views.tour_feed, name="tour_feed"),
+
+    # Sitemaps (pre-rendered, see main/sitemap.py)
+    path("sitemap.xml", views.sitemap_index, name="sitemap"),
+    path("sitemaps/<slug:name>.xml.gz", views.sitemap_shard, name="sitemap_shard"),
 
     # Reviews
     path("reviews/submit/", views.submit_review, name="submit_review"),
     path("reviews/load-more/", views.load_more_reviews, name="load_more_reviews"),
+    path("reviews/stream/", views.review_stream, name="review_stream"),
     path("delete-review/<int:review_id>/", views.delete_review, name="delete_review"),
+    path("reviews/moderate/", views.moderate_reviews, name="moderate_reviews"),
 
     # CKEditor
     path("ckeditor/", include("ckeditor_uploader.urls")),
@@ -1,22 +1,44 @@
+import datetime
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.utils.timezone import localtime
+from django.core.handlers.asgi import ASGIRequest
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.text import compress_sequence
+from django.utils.timezone import is_naive, localtime, make_aware
 from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
-from django.views.decorators.http import require_POST
-from django.core.mail import send_mail
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition, require_POST
 from django.utils.html import strip_tags
-from django.db.models import Q
+from django.conf import settings
 from .models import Review, Tour
-from .forms import ReviewForm
-
-
+from .forms import ModerationForm, ReviewForm
+from .mail import aenqueue_mail
+from .moderation import moderate
+from .throttle import throttle
+from .pagination import InvalidCursor, keyset_page
+from .search import search_tours
+from .cache import cache_public_page, catalogue_version, ratings_version, reviews_version
+from .counters import REVIEWS, get_count
+from .events import broadcaster, stream
+from .facets import TourFacets
+from .feed import FEED_VERSION, feed_lines, wants_gzip
+from . import sitemap
+from .streaming import streaming_content
+
+
+@throttle("review")
+@cache_public_page(reviews_version)
 def home(request):
     """
     Home page with latest reviews and AJAX review submission.
     """
-    all_reviews = Review.objects.order_by('-created_at')
-    latest_reviews = all_reviews[:3]
+    latest_reviews, next_cursor = keyset_page(Review.objects.filter(is_hidden=False), page_size=3)
     form = ReviewForm(request.POST or None)
 
     if request.method == "POST":
@@ -29,12 +51,7 @@ def home(request):
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
                 return JsonResponse({
                     "success": True,
-                    "review": {
-                        "id": review.id,
-                        "name": review.display_name(),
-                        "content": review.content,
-                        "created_at": localtime(review.created_at).strftime("%b %d, %Y"),
-                    },
+                    "review": review.as_json(),
                     "is_admin": request.user.is_staff,
                 })
             return redirect('home')
@@ -45,19 +62,27 @@ def home(request):
     return render(request, "main/home.html", {
         "page_title": "Home",
         "reviews": latest_reviews,
+        "next_cursor": next_cursor,
         "form": form,
-        "total_reviews": all_reviews.count(),
+        "total_reviews": get_count(REVIEWS),  # materialized, no COUNT(*)
     })
 
 
+@cache_public_page()
 def about(request):
     return render(request, "main/about.html", {"page_title": "About"})
 
 
-def contact(request):
+@throttle("contact")
+async def contact(request):
     """
     Contact page with optional ?tour= query param to prefill the message box.
-    Sends email to admin and confirmation email to user (HTML styled).
+    Queues an email to admin and a confirmation email to the user (HTML styled);
+    delivery happens in the send_queued_mail worker.
+
+    Async: under ASGI the outbox inserts are awaited instead of holding a
+    worker thread, so slow mail or database round trips don't cap how many
+    inquiries we accept at once.
     """
     tour_name = request.GET.get("tour", "").strip()
 
@@ -77,12 +102,11 @@ def contact(request):
         {message}
         """
 
-        send_mail(
+        await aenqueue_mail(
             subject,
             body,
             email or "no-reply@mbtravels.com",   # from
             ["info@mbtravels.com"],              # to (your inbox)
-            fail_silently=False,
         )
 
         # --- Confirmation Email to User ---
@@ -119,47 +143,177 @@ def contact(request):
 
             plain_message = strip_tags(html_message)
 
-            send_mail(
+            await aenqueue_mail(
                 confirm_subject,
                 plain_message,
                 "info@mbtravels.com",  # from
                 [email],               # to user
-                fail_silently=False,
                 html_message=html_message,
             )
 
         messages.success(request, "Thanks for reaching out! We've sent you a confirmation email.")
         return redirect("contact")
 
-    return render(request, "main/contact.html", {"tour_name": tour_name})
+    return await sync_to_async(render)(request, "main/contact.html", {"tour_name": tour_name})
 
 
+@cache_public_page(catalogue_version, ratings_version)
 def tours(request):
     """
-    Tours page with optional search and featured tours.
+    Tours page with optional full-text search, location/price/length
+    filters with counts (main/facets.py) and featured tours.
+    Card markup and the featured block are cached per catalogue version;
+    the featured queryset is lazy, so a cache hit never runs it.
     """
-    query = request.GET.get('q')
+    query = request.GET.get('q', '').strip()
+    snippets = {}
     if query:
-        all_tours = Tour.objects.filter(
-            Q(location__icontains=query) | Q(name__icontains=query)
-        )
+        all_tours, snippets = search_tours(query, Tour.objects.select_related('rating'))
     else:
-        all_tours = Tour.objects.all()
+        all_tours = Tour.objects.select_related('rating')
+    facets = TourFacets(request.GET)
+    facet_counts = facets.counts(all_tours)
+    all_tours = facets.filter(all_tours)
+
+    featured_tours = Tour.objects.select_related('rating').filter(is_featured=True)[:3]
 
-    featured_tours = Tour.objects.filter(is_featured=True)[:3]
+    if snippets:
+        all_tours = list(all_tours)
+        for tour in all_tours:
+            tour.search_snippet = snippets.get(tour.id)
 
     return render(request, 'main/tours.html', {
         'featured_tours': featured_tours,
-        'tours': all_tours
+        'tours': all_tours,
+        'query': query,
+        'facets': facet_counts,
+        'filtered': bool(facets.selected),
+        'catalogue_version': catalogue_version(),
+        'ratings_version': ratings_version(),
+        'fragment_timeout': settings.TOUR_FRAGMENT_CACHE_TIMEOUT,
     })
 
 
+def _tour_modified_at(request, slug):
+    """
+    Latest of the requested tour's and its rating's modified_at, looked up
+    once per request through the unique slug index. Used for ETag /
+    Last-Modified revalidation.
+    """
+    if not hasattr(request, "_tour_modified_at"):
+        row = Tour.objects.filter(slug=slug).values_list("modified_at", "rating__modified_at").first()
+        request._tour_modified_at = max(stamp for stamp in row if stamp) if row else None
+    return request._tour_modified_at
+
+
+def _tour_etag(request, slug):
+    modified_at = _tour_modified_at(request, slug)
+    if modified_at is None:
+        return None
+    # Staff see extra admin controls, so they get a different representation.
+    return f"{slug}-{modified_at.timestamp()}-{int(request.user.is_staff)}"
+
+
+@cache_public_page(catalogue_version, ratings_version)
+@condition(etag_func=_tour_etag, last_modified_func=_tour_modified_at)
 def tour_detail(request, slug):
     """
     Tour detail page using slug instead of pk.
+    The gallery is prefetched; revalidations get a 304 without rendering.
     """
-    tour = get_object_or_404(Tour, slug=slug)
-    return render(request, 'main/tour_detail.html', {'tour': tour})
+    tour = get_object_or_404(Tour.objects.select_related('rating').prefetch_related('gallery'), slug=slug)
+    return render(request, 'main/tour_detail.html', {
+        'tour': tour,
+        'review_form': ReviewForm(initial={'tour': tour.pk}),
+    })
+
+
+def _feed_since(request):
+    """Parsed ?since= timestamp (naive values are UTC); None when absent."""
+    raw = request.GET.get("since")
+    if not raw:
+        return None
+    since = parse_datetime(raw.replace(" ", "+"))  # an unescaped "+" arrives as a space
+    if since is None:
+        raise ValueError(raw)
+    return make_aware(since, datetime.timezone.utc) if is_naive(since) else since
+
+
+def _feed_etag(request):
+    try:
+        since = _feed_since(request)
+    except ValueError:
+        return None
+    # Every tour or gallery change bumps the catalogue version,
+    # so an unchanged catalogue revalidates without touching the database.
+    return "feed-v{}-{}-{}-{}".format(
+        FEED_VERSION,
+        catalogue_version(),
+        int(since.timestamp() * 1000000) if since else "all",
+        "gzip" if wants_gzip(request) else "identity",
+    )
+
+
+@condition(etag_func=_feed_etag)
+def tour_feed(request):
+    """
+    Partner feed: the catalogue as NDJSON (gzipped when accepted), streamed
+    in chunks. ?since=<ISO 8601> limits it to tours modified after that time.
+    """
+    try:
+        since = _feed_since(request)
+    except ValueError:
+        return JsonResponse({"error": "since must be an ISO 8601 timestamp."}, status=400)
+
+    gzipped = wants_gzip(request)
+    lines = feed_lines(request, since)
+    body = compress_sequence(lines) if gzipped else lines
+    response = StreamingHttpResponse(
+        streaming_content(request, body, settings.TOUR_FEED_CHUNK_SIZE), content_type="application/x-ndjson"
+    )
+    if gzipped:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    response["X-Feed-Version"] = str(FEED_VERSION)
+    return response
+
+
+@never_cache
+def csrf(request):
+    """CSRF token for forms on page-cached views, which cannot embed one."""
+    return JsonResponse({"token": get_token(request)})
+
+
+def _sitemap_modified(request, name=None):
+    if name is None and not default_storage.exists(sitemap.INDEX):
+        sitemap.build_all()  # first request after a fresh deploy
+    path = sitemap.INDEX if name is None else sitemap.shard_path(name)
+    try:
+        return default_storage.get_modified_time(path)
+    except (FileNotFoundError, NotImplementedError):
+        return None
+
+
+def _stored_file(request, path, content_type):
+    response = FileResponse(default_storage.open(path), content_type=content_type)
+    # Keeps the headers FileResponse set (Content-Length etc.) and the file's closer.
+    response.streaming_content = streaming_content(request, response.streaming_content, 16)
+    return response
+
+
+@condition(last_modified_func=_sitemap_modified)
+def sitemap_index(request):
+    """The sitemap index, read from storage (built by _sitemap_modified if it doesn't exist yet)."""
+    return _stored_file(request, sitemap.INDEX, "application/xml")
+
+
+@condition(last_modified_func=_sitemap_modified)
+def sitemap_shard(request, name):
+    """One gzipped sitemap file listed in the index."""
+    path = sitemap.shard_path(name)
+    if not default_storage.exists(path):
+        raise Http404("No such sitemap.")
+    return _stored_file(request, path, "application/x-gzip")
 
 
 @user_passes_test(lambda u: u.is_staff)
@@ -170,37 +324,77 @@ def delete_review(request, review_id):
     return JsonResponse({"success": True})
 
 
+@user_passes_test(lambda u: u.is_staff)
+@require_POST
+def moderate_reviews(request):
+    """
+    Hide, restore or delete many reviews in one set-based pass, selected by
+    `ids` or by a filter (see ModerationForm). Returns how many changed.
+    """
+    form = ModerationForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"success": False, "errors": form.errors}, status=400)
+    action = form.cleaned_data["action"]
+    count = moderate(form.reviews(), action)
+    return JsonResponse({"success": True, "action": action, "count": count})
+
+
 def load_more_reviews(request):
+    """
+    Cursor-paginated review feed for the "More Reviews" button.
+    Pass the `next` value from the previous response as ?cursor= to continue.
+    """
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        reviews = Review.objects.order_by('-created_at')[3:]
-        data = [{
-            "id": r.id,
-            "name": r.display_name(),
-            "content": r.content,
-            "created_at": localtime(r.created_at).strftime("%b %d, %Y"),
-        } for r in reviews]
+        try:
+            reviews, next_cursor = keyset_page(
+                Review.objects.filter(is_hidden=False),
+                cursor=request.GET.get("cursor"),
+                page_size=settings.REVIEWS_PAGE_SIZE,
+            )
+        except InvalidCursor:
+            return JsonResponse({"success": False, "error": "Invalid cursor."}, status=400)
+
+        data = [r.as_json() for r in reviews]
         return JsonResponse({
             "success": True,
             "reviews": data,
+            "next": next_cursor,
             "is_admin": request.user.is_staff
         })
     return JsonResponse({"success": False}, status=400)
 
 
-def submit_review(request):
+@throttle("review")
+async def submit_review(request):
+    """AJAX review submission (async; see contact)."""
     if request.method == "POST" and request.headers.get("x-requested-with") == "XMLHttpRequest":
-        form = ReviewForm(request.POST)
+        # A bound ReviewForm validates on init (to style error fields), and
+        # validation looks up the tour, so build it in a thread.
+        form = await sync_to_async(ReviewForm)(request.POST)
         if form.is_valid():
-            review = form.save()
+            review = await Review.objects.acreate(**form.cleaned_data)
+            user = await request.auser()
             return JsonResponse({
                 "success": True,
-                "review": {
-                    "id": review.id,
-                    "name": review.display_name(),
-                    "content": review.content,
-                    "created_at": localtime(review.created_at).strftime("%b %d, %Y"),
-                },
-                "is_admin": request.user.is_staff,
+                "review": review.as_json(),
+                "is_admin": user.is_staff,
             })
         return JsonResponse({"success": False, "errors": form.errors})
     return JsonResponse({"success": False})
+
+
+async def review_stream(request):
+    """
+    Server-sent events for reviews as they are created and deleted.
+    ASGI only: under WSGI every open stream would pin a worker thread.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Live updates need the ASGI server."}, status=501)
+    if broadcaster.full():
+        response = JsonResponse({"error": "Too many live connections."}, status=503)
+        response["Retry-After"] = "30"
+        return response
+    response = StreamingHttpResponse(stream(settings.REVIEW_STREAM_HEARTBEAT), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the stream
+    return response
@@ -1,9 +1,41 @@
 # tours/admin.py
 from django.contrib import admin
-from .models import Tour
+from .bookings import cancel
+from .models import Booking, Departure, Tour
 
 @admin.register(Tour)
 class TourAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
     list_display        = ("name", "region", "duration", "price", "featured")
     list_filter         = ("region", "featured")
+
+
+@admin.register(Departure)
+class DepartureAdmin(admin.ModelAdmin):
+    list_display        = ("tour", "date", "capacity", "booked", "seats_left")
+    list_filter         = ("tour",)
+    list_select_related = ("tour",)
+    date_hierarchy      = "date"
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display        = ("full_name", "departure", "seats", "status", "expires_at", "created_at")
+    list_filter         = ("status",)
+    list_select_related = ("departure__tour",)
+    search_fields       = ("full_name", "email")
+    # Seat counts live on Departure.booked; editing these here would desync it.
+    readonly_fields     = ("departure", "seats", "status", "expires_at")
+
+    actions             = ["cancel_bookings"]
+
+    def has_add_permission(self, request):
+        return False  # bookings are made through tours.bookings.reserve()
+
+    def has_delete_permission(self, request, obj=None):
+        return False  # deleting would keep its seats counted; cancel instead
+
+    def cancel_bookings(self, request, queryset):
+        cancelled = sum(cancel(pk) for pk in queryset.values_list("pk", flat=True))
+        self.message_user(request, f"{cancelled} booking(s) cancelled and their seats released")
+    cancel_bookings.short_description = "Cancel selected bookings (releases their seats)"
@@ -0,0 +1,35 @@
+"""
+Date-range availability search over departures.
+
+Departure keeps seats_left and end_date up to date as bookings change (see
+tours.bookings), so a search is one indexed query on departures
+(departure_availability_idx: date, seats_left) joined to their tour; it
+never looks at bookings.
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Departure
+
+
+def search_departures(start, end, guests=1, region=None):
+    """Departures that start and finish within [start, end] with room for `guests`."""
+    start = max(start, timezone.localdate() + datetime.timedelta(days=1))  # bookable ones only, as in tour_book
+    departures = (
+        Departure.objects.filter(date__gte=start, date__lte=end, end_date__lte=end, seats_left__gte=guests)
+        .select_related('tour')
+        .order_by('date', 'pk')
+    )
+    if region:
+        departures = departures.filter(tour__region__iexact=region)
+    return departures[:settings.AVAILABILITY_SEARCH_LIMIT]
+
+
+def group_by_tour(departures):
+    """[(tour, [departure, ...]), ...] in order of each tour's first open date."""
+    tours = {}
+    for departure in departures:
+        tours.setdefault(departure.tour_id, (departure.tour, []))[1].append(departure)
+    return list(tours.values())
@@ -0,0 +1,108 @@
+"""
+Seat inventory for departures.
+
+A booking first holds its seats, then the guest confirms it from the link
+in their email; holds that are not confirmed in time are released. Every
+change to Departure.booked (and its mirror, seats_left, which the
+availability search reads) is a single conditional UPDATE, so the check and
+the increment happen together in the database:
+
+    UPDATE ... SET booked = booked + n, seats_left = seats_left - n
+    WHERE id = ... AND seats_left >= n
+
+Two requests racing for the last seats cannot both succeed, on SQLite
+(one writer at a time) or Postgres (the second UPDATE waits on the row
+lock and re-checks the condition), without a read-then-write window.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Booking, Departure
+
+TOKEN_SALT = "tours.booking"
+
+
+class SoldOut(Exception):
+    pass
+
+
+def _take_seats(departure_id, seats):
+    return Departure.objects.filter(
+        pk=departure_id, seats_left__gte=seats
+    ).update(booked=F("booked") + seats, seats_left=F("seats_left") - seats)
+
+
+def reserve(departure_id, seats, full_name, email):
+    """Hold `seats` on a departure and return the HELD booking, or raise SoldOut."""
+    with transaction.atomic():
+        if not _take_seats(departure_id, seats):
+            # Lapsed holds may still be counted; free them and try once more.
+            if not expire_holds(departure_id=departure_id) or not _take_seats(departure_id, seats):
+                raise SoldOut
+        return Booking.objects.create(
+            departure_id=departure_id,
+            seats=seats,
+            full_name=full_name,
+            email=email,
+            expires_at=timezone.now() + datetime.timedelta(minutes=settings.BOOKING_HOLD_MINUTES),
+        )
+
+
+def confirm(booking_id):
+    """Turn a live hold into a confirmed booking. False if it lapsed or was already handled."""
+    return bool(Booking.objects.filter(
+        pk=booking_id, status=Booking.Status.HELD, expires_at__gt=timezone.now()
+    ).update(status=Booking.Status.CONFIRMED, expires_at=None))
+
+
+def cancel(booking_id):
+    """Cancel a held or confirmed booking and give its seats back. False if it was not live."""
+    with transaction.atomic():
+        row = Booking.objects.filter(pk=booking_id).values_list("departure_id", "seats").first()
+        if row is None or not Booking.objects.filter(
+            pk=booking_id, status__in=[Booking.Status.HELD, Booking.Status.CONFIRMED]
+        ).update(status=Booking.Status.CANCELLED, expires_at=None):
+            return False
+        _release_seats(*row)
+    return True
+
+
+def _release_seats(departure_id, seats):
+    Departure.objects.filter(pk=departure_id).update(booked=F("booked") - seats, seats_left=F("seats_left") + seats)
+
+
+def expire_holds(departure_id=None, batch_size=1000):
+    """Release every lapsed hold (optionally on one departure); returns how many."""
+    holds = Booking.objects.filter(status=Booking.Status.HELD, expires_at__lte=timezone.now())
+    if departure_id is not None:
+        holds = holds.filter(departure_id=departure_id)
+    released = 0
+    while True:
+        with transaction.atomic():
+            # Lock the rows so a concurrent confirm() waits and then finds
+            # them no longer HELD (no-op on SQLite, which has a single writer).
+            batch = list(holds.select_for_update().values_list("pk", "departure_id", "seats")[:batch_size])
+            if not batch:
+                return released
+            Booking.objects.filter(pk__in=[pk for pk, _, _ in batch]).update(status=Booking.Status.EXPIRED)
+            seats = Counter()
+            for _, departure, n in batch:
+                seats[departure] += n
+            for departure, n in seats.items():
+                _release_seats(departure, n)
+        released += len(batch)
+
+
+def confirmation_token(booking):
+    return signing.dumps(booking.pk, salt=TOKEN_SALT)
+
+
+def booking_from_token(token):
+    """The booking id in a confirmation link; raises signing.BadSignature if tampered with."""
+    return signing.loads(token, salt=TOKEN_SALT)
@@ -2,6 +2,14 @@ import re
 from django import forms
 
 class BookingForm(forms.Form):
+    # Choices come from the view (see __init__), so validating the form
+    # never touches the database and it can be used from async views.
+    departure = forms.TypedChoiceField(
+        coerce=int,
+        label="Departure date",
+        widget=forms.Select(attrs={'class': 'form-input'}),
+        error_messages={'required': 'Please choose a departure date.'}
+    )
     full_name = forms.CharField(
         max_length=100,
         widget=forms.TextInput(attrs={'placeholder': 'Full name', 'class': 'form-input'}),
@@ -22,9 +30,41 @@ class BookingForm(forms.Form):
         }
     )
 
+    def __init__(self, *args, departures=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['departure'].choices = [
+            (d.pk, f"{d.date:%a %d %b %Y} ({d.seats_left} seats left)") for d in departures
+        ]
+
     def clean_full_name(self):
         name = self.cleaned_data.get('full_name', '').strip()
         # allow letters, spaces, hyphens and apostrophes
         if not re.match(r"^[A-Za-z\s\'\-]+$", name):
             raise forms.ValidationError("Enter a valid name (letters, spaces, hyphens and apostrophes only).")
         return name
+
+
+class AvailabilityForm(forms.Form):
+    start = forms.DateField(label="From", widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-input'}))
+    end = forms.DateField(label="To", widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-input'}))
+    guests = forms.IntegerField(
+        min_value=1,
+        max_value=20,
+        initial=2,
+        widget=forms.NumberInput(attrs={'class': 'form-input', 'min': '1', 'max': '20'}),
+    )
+    region = forms.CharField(
+        max_length=50,
+        required=False,
+        widget=forms.TextInput(attrs={'placeholder': 'Any region', 'class': 'form-input'}),
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('start'), cleaned.get('end')
+        if start and end:
+            if end < start:
+                raise forms.ValidationError("The end date must be on or after the start date.")
+            if (end - start).days > 366:
+                raise forms.ValidationError("Please search at most a year at a time.")
+        return cleaned
@@ -0,0 +1,77 @@
+import datetime
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+
+from tours.bookings import SoldOut, reserve
+from tours.models import Booking, Departure, Tour
+
+STRESS_SLUG = "booking-stress"
+
+
+def book_seats(worker, departure_id, attempts, seats):
+    """Body of one forked worker: try to book, like concurrent checkout requests."""
+    connections.close_all()  # never reuse the parent's connection after fork
+    ok = sold_out = errors = 0
+    for i in range(attempts):
+        try:
+            reserve(departure_id, seats, f"Stress Worker {worker}", f"worker{worker}-{i}@example.com")
+        except SoldOut:
+            sold_out += 1
+        except OperationalError:
+            errors += 1
+        else:
+            ok += 1
+    connections.close_all()
+    return ok, sold_out, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent bookings at one departure from forked worker processes and check it is "
+        "never oversold. Works on file-backed SQLite or Postgres (DATABASE_URL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--attempts", type=int, default=50, help="Bookings tried per worker.")
+        parser.add_argument("--capacity", type=int, default=100)
+        parser.add_argument("--seats", type=int, default=1, help="Seats per booking.")
+        parser.add_argument("--keep", action="store_true", help="Keep the tour, departure and bookings.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError("This command needs a file-backed SQLite database or Postgres.")
+
+        Tour.objects.filter(slug=STRESS_SLUG).delete()
+        tour = Tour.objects.create(
+            name="Booking Stress", slug=STRESS_SLUG, region="Test", duration=1, price=0, description="Stress test"
+        )
+        departure = Departure.objects.create(
+            tour=tour, date=datetime.date.today() + datetime.timedelta(days=30), capacity=options["capacity"]
+        )
+
+        connections.close_all()
+        jobs = [(w, departure.pk, options["attempts"], options["seats"]) for w in range(options["workers"])]
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(options["workers"]) as pool:
+            results = pool.starmap(book_seats, jobs)
+        elapsed = time.perf_counter() - start
+
+        ok, sold_out, errors = (sum(column) for column in zip(*results))
+        departure.refresh_from_db()
+        held = Booking.objects.filter(departure=departure).aggregate(seats=Sum("seats"))["seats"] or 0
+        self.stdout.write(
+            f"{connection.vendor}: {ok} booked, {sold_out} sold out, {errors} error(s) in {elapsed:.2f}s "
+            f"({(ok + sold_out) / elapsed:.0f} attempts/s); {departure.booked}/{departure.capacity} seats taken"
+        )
+        if not options["keep"]:
+            tour.delete()
+
+        if departure.booked > departure.capacity or departure.booked != held:
+            raise CommandError(f"Inventory broken: booked={departure.booked}, held by bookings={held}")
+        if errors:
+            raise CommandError(f"{errors} booking(s) failed with database errors")
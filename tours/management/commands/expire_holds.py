@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tours.bookings import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Release seats held by bookings that were not confirmed in time. Run it from cron every few minutes."
+
+    def handle(self, *args, **options):
+        released = expire_holds()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} lapsed hold(s)"))
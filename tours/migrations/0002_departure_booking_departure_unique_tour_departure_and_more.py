@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveSmallIntegerField()),
+                ('booked', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='tours.tour')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('seats', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('held', 'Held'), ('confirmed', 'Confirmed'), ('expired', 'Expired'), ('cancelled', 'Cancelled')], default='held', max_length=10)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='When an unconfirmed hold lapses', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('departure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='tours.departure')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departure',
+            constraint=models.UniqueConstraint(fields=('tour', 'date'), name='unique_tour_departure'),
+        ),
+        migrations.AddConstraint(
+            model_name='departure',
+            constraint=models.CheckConstraint(condition=models.Q(('booked__lte', models.F('capacity'))), name='departure_not_oversold'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'expires_at'], name='tours_booki_status_922bfd_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:02
+
+import datetime
+
+from django.db import migrations, models
+
+
+def fill_availability(apps, schema_editor):
+    Departure = apps.get_model('tours', 'Departure')
+    departures = list(Departure.objects.select_related('tour'))
+    for departure in departures:
+        departure.seats_left = departure.capacity - departure.booked
+        departure.end_date = departure.date + datetime.timedelta(days=max(departure.tour.duration, 1) - 1)
+    Departure.objects.bulk_update(departures, ['seats_left', 'end_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0002_departure_booking_departure_unique_tour_departure_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departure',
+            name='seats_left',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='departure',
+            name='end_date',
+            field=models.DateField(editable=False, help_text='Last day of the trip', null=True),
+        ),
+        migrations.RunPython(fill_availability, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='departure',
+            name='end_date',
+            field=models.DateField(editable=False, help_text='Last day of the trip'),
+        ),
+        migrations.AddConstraint(
+            model_name='departure',
+            constraint=models.CheckConstraint(condition=models.Q(('seats_left', models.F('capacity') - models.F('booked'))), name='departure_seats_left_in_step'),
+        ),
+        migrations.AddIndex(
+            model_name='departure',
+            index=models.Index(fields=['date', 'seats_left'], name='departure_availability_idx'),
+        ),
+    ]
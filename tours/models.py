@@ -1,5 +1,9 @@
 # tours/models.py
-from django.db import models
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q
 
 class Tour(models.Model):
     name        = models.CharField(max_length=100)
@@ -13,3 +17,80 @@ class Tour(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the departures' availability window in step with the tour length.
+        departures = list(self.departures.all())
+        for departure in departures:
+            departure.end_date = departure.trip_end(self.duration)
+        Departure.objects.bulk_update(departures, ['end_date'])
+
+
+class Departure(models.Model):
+    tour     = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='departures')
+    date     = models.DateField()
+    capacity = models.PositiveSmallIntegerField()
+    # Seats held or confirmed. Only ever changed with conditional UPDATEs in
+    # tours.bookings, never by saving a loaded instance.
+    booked   = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Denormalised for the availability search (tours.availability), so it
+    # filters on indexed columns instead of joining and aggregating bookings.
+    seats_left = models.PositiveSmallIntegerField(default=0, editable=False)
+    end_date   = models.DateField(editable=False, help_text="Last day of the trip")
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['tour', 'date'], name='unique_tour_departure'),
+            models.CheckConstraint(condition=Q(booked__lte=F('capacity')), name='departure_not_oversold'),
+            models.CheckConstraint(
+                condition=Q(seats_left=F('capacity') - F('booked')), name='departure_seats_left_in_step'
+            ),
+        ]
+        indexes = [models.Index(fields=['date', 'seats_left'], name='departure_availability_idx')]
+
+    def __str__(self):
+        return f"{self.tour} – {self.date:%d %b %Y}"
+
+    def clean(self):
+        # Compare against the live count; bookings may have come in since this form was loaded.
+        booked = 0 if self._state.adding else Departure.objects.values_list('booked', flat=True).get(pk=self.pk)
+        if self.capacity is not None and self.capacity < booked:
+            raise ValidationError({'capacity': f"{booked} seats are already booked on this departure."})
+
+    def trip_end(self, duration):
+        return self.date + datetime.timedelta(days=max(duration, 1) - 1)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if not self._state.adding:
+                # Bookings may have changed `booked` since this instance was
+                # loaded (e.g. in the admin); don't write a stale count back.
+                self.booked = Departure.objects.select_for_update().values_list('booked', flat=True).get(pk=self.pk)
+            self.seats_left = self.capacity - self.booked
+            self.end_date = self.trip_end(self.tour.duration)
+            super().save(*args, **kwargs)
+
+
+class Booking(models.Model):
+    class Status(models.TextChoices):
+        HELD      = 'held', 'Held'
+        CONFIRMED = 'confirmed', 'Confirmed'
+        EXPIRED   = 'expired', 'Expired'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    departure  = models.ForeignKey(Departure, on_delete=models.CASCADE, related_name='bookings')
+    full_name  = models.CharField(max_length=100)
+    email      = models.EmailField()
+    seats      = models.PositiveSmallIntegerField()
+    status     = models.CharField(max_length=10, choices=Status.choices, default=Status.HELD)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="When an unconfirmed hold lapses")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'expires_at'])]  # expiry sweep
+
+    def __str__(self):
+        return f"{self.full_name} × {self.seats} ({self.get_status_display()})"
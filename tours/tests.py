@@ -1,3 +1,199 @@
-from django.test import TestCase
+import datetime
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from main.models import OutboundEmail
+
+from .availability import search_departures
+from .bookings import SoldOut, cancel, confirm, confirmation_token, expire_holds, reserve
+from .models import Booking, Departure, Tour
+
+# Keep the per-request performance log out of the test output.
+logging.getLogger("main.performance").setLevel(logging.WARNING)
+
+
+def make_departure(capacity=4, days_ahead=10, tour=None):
+    tour = tour or Tour.objects.create(
+        name="Mara Migration", slug="mara-migration", region="Kenya", duration=3, price=1000, description="Herds."
+    )
+    return Departure.objects.create(
+        tour=tour, date=timezone.localdate() + datetime.timedelta(days=days_ahead), capacity=capacity
+    )
+
+
+def lapse(booking):
+    Booking.objects.filter(pk=booking.pk).update(expires_at=timezone.now() - datetime.timedelta(minutes=1))
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.departure = make_departure()
+
+    def test_reserve_holds_seats_until_full(self):
+        booking = reserve(self.departure.pk, 3, "Amani", "amani@example.com")
+        self.assertEqual(booking.status, Booking.Status.HELD)
+        with self.assertRaises(SoldOut):
+            reserve(self.departure.pk, 2, "Baraka", "baraka@example.com")
+        reserve(self.departure.pk, 1, "Baraka", "baraka@example.com")
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.seats_left, 0)
+
+    def test_lapsed_holds_are_released(self):
+        lapse(reserve(self.departure.pk, 4, "Amani", "amani@example.com"))
+        # reserve() frees lapsed holds on the departure when it runs out of seats
+        reserve(self.departure.pk, 3, "Baraka", "baraka@example.com")
+        lapse(Booking.objects.get(full_name="Baraka"))
+        call_command("expire_holds", stdout=mock.Mock())
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.booked, 0)
+        self.assertFalse(Booking.objects.filter(status=Booking.Status.HELD).exists())
+
+    def test_confirm_only_live_holds(self):
+        booking = reserve(self.departure.pk, 1, "Amani", "amani@example.com")
+        self.assertTrue(confirm(booking.pk))
+        self.assertFalse(confirm(booking.pk))
+        lapsed = reserve(self.departure.pk, 1, "Baraka", "baraka@example.com")
+        lapse(lapsed)
+        self.assertFalse(confirm(lapsed.pk))
+        self.assertEqual(expire_holds(), 1)
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.booked, 1)  # the confirmed booking keeps its seat
+
+    def test_book_view_holds_seats_and_emails_link(self):
+        response = self.client.post(reverse("tours:book", args=[self.departure.tour.slug]), {
+            "departure": self.departure.pk, "full_name": "Amani Otieno",
+            "email": "amani@example.com", "attendees": 2,
+        })
+        self.assertTemplateUsed(response, "tours/booking_success.html")
+        booking = Booking.objects.get()
+        self.assertIn(confirmation_token(booking), OutboundEmail.objects.get().body)
+
+        sold_out = self.client.post(reverse("tours:book", args=[self.departure.tour.slug]), {
+            "departure": self.departure.pk, "full_name": "Baraka",
+            "email": "baraka@example.com", "attendees": 3,
+        })
+        self.assertContains(sold_out, "Not enough seats left")
+
+    def test_cancel_releases_seats(self):
+        held = reserve(self.departure.pk, 3, "Amani", "amani@example.com")
+        self.assertTrue(cancel(held.pk))
+        self.assertFalse(cancel(held.pk))
+        held.refresh_from_db()
+        self.departure.refresh_from_db()
+        self.assertEqual(held.status, Booking.Status.CANCELLED)
+        self.assertEqual((self.departure.booked, self.departure.seats_left), (0, 4))
+
+    def test_admin_cancels_instead_of_deleting(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="pw"))
+        booking = reserve(self.departure.pk, 3, "Amani", "amani@example.com")
+        self.assertEqual(self.client.get(reverse("admin:tours_booking_delete", args=[booking.pk])).status_code, 403)
+        self.client.post(reverse("admin:tours_booking_changelist"), {
+            "action": "cancel_bookings", "_selected_action": [booking.pk],
+        })
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.seats_left, 4)
+
+        # Capacity below the seats booked is a form error, not a database error
+        reserve(self.departure.pk, 3, "Baraka", "baraka@example.com")
+        response = self.client.post(reverse("admin:tours_departure_change", args=[self.departure.pk]), {
+            "tour": self.departure.tour.pk, "date": self.departure.date, "capacity": 2,
+        })
+        self.assertContains(response, "3 seats are already booked")
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.capacity, 4)
+
+    def test_confirmation_link(self):
+        booking = reserve(self.departure.pk, 1, "Amani", "amani@example.com")
+        url = reverse("tours:confirm_booking", args=[confirmation_token(booking)])
+        self.assertContains(self.client.get(url), "Confirm Booking")
+        self.assertEqual(Booking.objects.get().status, Booking.Status.HELD)  # GET never confirms
+        self.assertContains(self.client.post(url, follow=True), "This booking is confirmed.")
+        self.assertEqual(self.client.get(url + "x").status_code, 404)
+
+
+class AvailabilitySearchTests(TestCase):
+    def setUp(self):
+        self.mara = make_departure(capacity=4, days_ahead=10)  # 3-day trip
+        self.start = self.mara.date
+        serengeti = Tour.objects.create(
+            name="Serengeti", slug="serengeti", region="Tanzania", duration=1, price=900, description="Lions."
+        )
+        self.serengeti = make_departure(capacity=2, days_ahead=12, tour=serengeti)
+
+    def search(self, days, guests=1, region=None):
+        return list(search_departures(self.start, self.start + datetime.timedelta(days=days), guests, region))
+
+    def test_trip_must_fit_and_have_room(self):
+        self.assertEqual(self.search(days=2), [self.mara, self.serengeti])
+        self.assertEqual(self.search(days=1), [])  # the Mara trip ends a day later
+        self.assertEqual(self.search(days=2, guests=3), [self.mara])
+        self.assertEqual(self.search(days=2, region="tanzania"), [self.serengeti])
+
+    def test_follows_bookings_and_tour_changes(self):
+        booking = reserve(self.mara.pk, 2, "Amani", "amani@example.com")
+        self.assertEqual(self.search(days=2, guests=3), [])
+        lapse(booking)
+        expire_holds()
+        self.assertEqual(self.search(days=2, guests=3), [self.mara])
+
+        tour = self.mara.tour
+        tour.duration = 5
+        tour.save()
+        self.assertEqual(self.search(days=2), [self.serengeti])
+
+    def test_admin_save_keeps_live_booked_count(self):
+        stale = Departure.objects.get(pk=self.mara.pk)
+        reserve(self.mara.pk, 3, "Amani", "amani@example.com")
+        stale.capacity = 6
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual((stale.booked, stale.seats_left), (3, 3))
+
+    def test_search_is_one_indexed_query(self):
+        with self.assertNumQueries(1):
+            self.search(days=2)
+        self.assertIn("departure_availability_idx", search_departures(self.start, self.start, 4).explain())
+
+    def test_search_page(self):
+        response = self.client.get(reverse("tours:departure_search"), {
+            "start": self.start, "end": self.start + datetime.timedelta(days=5), "guests": 2, "region": "Kenya",
+        })
+        self.assertContains(response, "Mara Migration")
+        self.assertContains(response, "$1000.00")  # the site's currency format
+        self.assertNotContains(response, "Serengeti")
+
+
+class BookingConcurrencyTests(SimpleTestCase):
+    """Runs real worker processes against a throwaway file-backed SQLite database."""
+
+    def manage(self, *args):
+        env = dict(os.environ, SQLITE_PATH=self.db_path)
+        env.pop("DATABASE_URL", None)
+        return subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), *args],
+            env=env, capture_output=True, text=True, timeout=120,
+        )
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.db_path = os.path.join(tmp, "bookings.sqlite3")
+        self.assertEqual(self.manage("migrate", "-v0").returncode, 0)
+
+    def test_departure_is_never_oversold(self):
+        result = self.manage("booking_stress", "--workers", "12", "--attempts", "30", "--capacity", "100")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("100 booked, 260 sold out, 0 error(s)", result.stdout)
+        self.assertIn("100/100 seats taken", result.stdout)
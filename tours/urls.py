@@ -2,12 +2,14 @@
 # URL patterns for the tours module
 
 from django.urls import path
-from .views import tour_list, tour_detail, tour_book
+from .views import tour_list, tour_detail, tour_book, confirm_booking, departure_search
 
 app_name = 'tours'
 
 urlpatterns = [
     path('', tour_list, name='list'),
+    path('departures/search/', departure_search, name='departure_search'),
+    path('bookings/<str:token>/', confirm_booking, name='confirm_booking'),
     # ensure the book URL is checked before the generic detail URL
     path('<slug:slug>/book/', tour_book, name='book'),
     path('<slug:slug>/', tour_detail, name='detail'),
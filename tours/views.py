@@ -1,48 +1,103 @@
 # tours/views.py
-from django.shortcuts import render, get_object_or_404, redirect
-from django.core.mail import send_mail
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
 from django.contrib import messages
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
 import logging
 
-from .models import Tour
+from main.mail import aenqueue_mail
+from main.throttle import throttle
+from .availability import group_by_tour, search_departures
+from .bookings import SoldOut, booking_from_token, confirm, confirmation_token, reserve
+from .models import Booking, Tour
 try:
-    from .forms import BookingForm
+    from .forms import AvailabilityForm, BookingForm
 except Exception:
-    BookingForm = None
+    AvailabilityForm = BookingForm = None
     logging.warning("BookingForm could not be imported; booking forms will be disabled.")
 
 def tour_list(request):
     tours = Tour.objects.filter(featured=True)
     return render(request, 'tours/list.html', {'tours': tours})
 
+def departure_search(request):
+    """Tours with open departures in a date range, for a number of guests and optionally a region."""
+    form = AvailabilityForm(request.GET or None)
+    results = None
+    if form.is_bound and form.is_valid():
+        data = form.cleaned_data
+        results = group_by_tour(search_departures(data['start'], data['end'], data['guests'], data['region']))
+    return render(request, 'tours/search.html', {'form': form, 'results': results})
+
 def tour_detail(request, slug):
     tour = get_object_or_404(Tour, slug=slug)
     return render(request, 'tours/detail.html', {'tour': tour})
 
-def tour_book(request, slug):
-    tour = get_object_or_404(Tour, slug=slug)
+@throttle('booking')
+async def tour_book(request, slug):
+    # Async: the tour lookup and the outbox insert are awaited, not run on a worker thread.
+    tour = await aget_object_or_404(Tour, slug=slug)
+    departures = [
+        d async for d in tour.departures.filter(date__gt=timezone.localdate(), seats_left__gt=0)
+    ]
 
     if request.method == 'POST' and BookingForm is not None:
-        form = BookingForm(request.POST)
-        if form.is_valid():
+        form = BookingForm(request.POST, departures=departures)
+        if form.is_valid():  # plain Form, no database access
             data = form.cleaned_data
             try:
-                send_mail(
-                    f"Booking Confirmation: {tour.name}",
-                    f"Hi {data.get('full_name','')}, thanks for booking {tour.name} for {data.get('attendees','')} guest(s).",
-                    'no-reply@bmsafaris.com',
-                    [data.get('email')],
+                booking = await sync_to_async(reserve)(
+                    data['departure'], data['attendees'], data['full_name'], data['email']
                 )
-            except Exception:
-                logging.exception("Failed to send booking confirmation email")
-                messages.error(request, "Booking received but confirmation email failed to send.")
+            except SoldOut:
+                form.add_error('attendees', "Not enough seats left on that departure.")
             else:
-                messages.success(request, "Booking received. A confirmation email has been sent.")
-            return render(request, 'tours/booking_success.html', {'tour': tour})
+                confirm_url = request.build_absolute_uri(
+                    reverse('tours:confirm_booking', args=[confirmation_token(booking)])
+                )
+                await aenqueue_mail(
+                    f"Confirm your booking: {tour.name}",
+                    f"Hi {data['full_name']}, we're holding {booking.seats} seat(s) on {tour.name} for you "
+                    f"for {settings.BOOKING_HOLD_MINUTES} minutes. Confirm your booking here: {confirm_url}",
+                    'no-reply@bmsafaris.com',
+                    [data['email']],
+                )
+                messages.success(request, "Seats held. Check your email to confirm the booking.")
+                return await sync_to_async(render)(request, 'tours/booking_success.html', {
+                    'tour': tour,
+                    'booking': booking,
+                })
     else:
-        form = BookingForm() if BookingForm is not None else None
+        form = BookingForm(departures=departures) if BookingForm is not None else None
 
-    return render(request, 'tours/book.html', {
+    return await sync_to_async(render)(request, 'tours/book.html', {
         'tour': tour,
         'form': form,
+        'hold_minutes': settings.BOOKING_HOLD_MINUTES,
+    })
+
+@require_http_methods(['GET', 'POST'])
+def confirm_booking(request, token):
+    """Landing page for the emailed link; confirming is a POST so link scanners can't do it."""
+    try:
+        booking_id = booking_from_token(token)
+    except signing.BadSignature:
+        raise Http404("Invalid booking link.")
+    booking = get_object_or_404(Booking.objects.select_related('departure__tour'), pk=booking_id)
+
+    if request.method == 'POST':
+        if confirm(booking.pk):
+            messages.success(request, "Your booking is confirmed. See you on safari!")
+        return redirect('tours:confirm_booking', token=token)
+
+    if booking.status == Booking.Status.HELD and booking.expires_at <= timezone.now():
+        booking.status = Booking.Status.EXPIRED  # lapsed, just not swept yet
+    return render(request, 'tours/booking_status.html', {
+        'tour': booking.departure.tour,
+        'booking': booking,
     })